@@ -1,6 +1,7 @@
 """Core agent implementations."""
 
-from .agent import Agent, ModelConfig
+from .agent import Agent, AgentSession, ModelConfig
+from .pool import AgentPool
 from .tools.base import Tool
 
-__all__ = ["Agent", "ModelConfig", "Tool"]
+__all__ = ["Agent", "AgentPool", "AgentSession", "ModelConfig", "Tool"]
@@ -2,16 +2,23 @@
 
 import asyncio
 import os
-from contextlib import AsyncExitStack
+from contextlib import asynccontextmanager
 from dataclasses import dataclass
-from typing import Any
+from typing import Any, AsyncIterator, Awaitable
 
-from anthropic import Anthropic
+from anthropic import Anthropic, AsyncAnthropic
 
 from .tools.base import Tool
-from .utils.connections import setup_mcp_connections
+from .tools.mcp_tool import remove_spill_dir
+from .utils.batch_util import fetch_batch_results
+from .utils.catalog_util import ToolCatalog
+from .utils.client_util import call_api, is_async_method
+from .utils.connections import MCPConnectionPool
+from .utils.history_store import HistoryStore
 from .utils.history_util import MessageHistory
-from .utils.tool_util import execute_tools
+from .utils.summary_util import SummaryCompactor
+from .utils.token_util import TokenEstimator
+from .utils.tool_util import ToolLimits, ToolResultCache, execute_tools
 
 
 @dataclass
@@ -22,6 +29,10 @@ class ModelConfig:
     max_tokens: int = 4096
     temperature: float = 1.0
     context_window_tokens: int = 180000
+    enable_caching: bool = True
+    # Cheaper model used to summarize old history in the background
+    compaction_model: str | None = None
+    compaction_watermark: float = 0.7
 
 
 class Agent:
@@ -35,7 +46,8 @@ class Agent:
         mcp_servers: list[dict[str, Any]] | None = None,
         config: ModelConfig | None = None,
         verbose: bool = False,
-        client: Anthropic | None = None,
+        client: Anthropic | AsyncAnthropic | None = None,
+        history_store: HistoryStore | None = None,
     ):
         self.name = name
         self.system = system
@@ -43,62 +55,147 @@ class Agent:
         self.tools = list(tools or [])
         self.config = config or ModelConfig()
         self.mcp_servers = mcp_servers or []
-        self.client = client or Anthropic(
+        self.mcp_pool = MCPConnectionPool(catalog=ToolCatalog())
+        self.client = client or AsyncAnthropic(
             api_key=os.environ.get("ANTHROPIC_API_KEY", "")
         )
-        self.history = MessageHistory(
+        self.token_estimator = TokenEstimator()
+        self.history_store = history_store
+        self.tool_cache = ToolResultCache()
+        self.tool_limits = ToolLimits()
+        self.history = self.new_history()
+        self._tools_payload_key: tuple = ()
+        self._tools_payload: list[dict[str, Any]] = []
+        self._system_payload_key: str | None = None
+        self._system_payload: str | list[dict[str, Any]] = self.system
+
+        if self.verbose:
+            print(f"\n[{self.name}] Agent initialized")
+
+    def new_history(
+        self, conversation_id: str | None = None
+    ) -> MessageHistory:
+        """Create a message history for this agent's model.
+
+        With a history store, an existing `conversation_id` resumes that
+        conversation.
+        """
+        compactor = None
+        if self.config.compaction_model:
+            compactor = SummaryCompactor(
+                self.client,
+                model=self.config.compaction_model,
+                watermark=self.config.compaction_watermark,
+            )
+        return MessageHistory(
             model=self.config.model,
             system=self.system,
             context_window_tokens=self.config.context_window_tokens,
             client=self.client,
+            enable_caching=self.config.enable_caching,
+            estimator=self.token_estimator,
+            compactor=compactor,
+            store=self.history_store,
+            conversation_id=conversation_id,
         )
 
-        if self.verbose:
-            print(f"\n[{self.name}] Agent initialized")
+    def session(self, conversation_id: str | None = None) -> "AgentSession":
+        """Start or resume a conversation that shares this agent's config."""
+        return AgentSession(self, self.new_history(conversation_id))
 
-    def _prepare_api_params(self) -> dict[str, Any]:
+    def _get_tools_payload(self, tools: list[Tool]) -> list[dict[str, Any]]:
+        """Get tool definitions for the API, rebuilt only when tools change.
+
+        With caching enabled, the last tool carries a cache breakpoint so the
+        whole tools array is served from the prompt cache.
+        """
+        # Holding the tools in the key keeps their ids from being reused
+        key = tuple(
+            (tool, tool.name, tool.description, id(tool.input_schema))
+            for tool in tools
+        )
+        if key != self._tools_payload_key:
+            payload = [tool.to_dict() for tool in tools]
+            if self.config.enable_caching and payload:
+                payload[-1] = {
+                    **payload[-1],
+                    "cache_control": {"type": "ephemeral"},
+                }
+            self._tools_payload_key = key
+            self._tools_payload = payload
+        return self._tools_payload
+
+    def _get_system_payload(self) -> str | list[dict[str, Any]]:
+        """Get the system prompt for the API with its own cache breakpoint."""
+        if self.system != self._system_payload_key:
+            if self.config.enable_caching and self.system:
+                self._system_payload = [
+                    {
+                        "type": "text",
+                        "text": self.system,
+                        "cache_control": {"type": "ephemeral"},
+                    }
+                ]
+            else:
+                self._system_payload = self.system
+            self._system_payload_key = self.system
+        return self._system_payload
+
+    def _prepare_api_params(
+        self, history: MessageHistory, tools: list[Tool]
+    ) -> dict[str, Any]:
         """Prepare parameters for Claude API call."""
+        tools_payload = self._get_tools_payload(tools)
+        history.set_tools(tools_payload)
         # Use system prompt directly without prefixing
         return {
             "model": self.config.model,
             "max_tokens": self.config.max_tokens,
             "temperature": self.config.temperature,
-            "system": self.system,
-            "messages": self.history.format_for_api(),
-            "tools": [tool.to_dict() for tool in self.tools],
+            "system": self._get_system_payload(),
+            "messages": history.format_for_api(),
+            "tools": tools_payload,
         }
 
-    async def _agent_loop(self, user_input: str) -> list[dict[str, Any]]:
+    def _log_response(self, response: Any) -> None:
+        """Print the text and tool calls of a model response."""
+        for block in response.content:
+            if block.type == "text":
+                print(f"\n[{self.name}] Output: {block.text}")
+            elif block.type == "tool_use":
+                params_str = ", ".join(
+                    [f"{k}={v}" for k, v in block.input.items()]
+                )
+                print(f"\n[{self.name}] Tool call: {block.name}({params_str})")
+
+    def _log_tool_results(self, tool_results: list[dict[str, Any]]) -> None:
+        """Print the content of tool results."""
+        for block in tool_results:
+            print(f"\n[{self.name}] Tool result: {block.get('content')}")
+
+    async def _agent_loop(
+        self, user_input: str, history: MessageHistory, tools: list[Tool]
+    ) -> list[dict[str, Any]]:
         """Process user input and handle tool calls in a loop"""
         if self.verbose:
             print(f"\n[{self.name}] Received: {user_input}")
-        await self.history.add_message("user", user_input, None)
+        await history.add_message("user", user_input, None)
 
-        tool_dict = {tool.name: tool for tool in self.tools}
+        tool_dict = {tool.name: tool for tool in tools}
 
         while True:
-            self.history.truncate()
-            params = self._prepare_api_params()
+            history.truncate()
+            params = self._prepare_api_params(history, tools)
 
-            response = self.client.messages.create(**params)
+            response = await call_api(self.client.messages.create, **params)
             tool_calls = [
                 block for block in response.content if block.type == "tool_use"
             ]
 
             if self.verbose:
-                for block in response.content:
-                    if block.type == "text":
-                        print(f"\n[{self.name}] Output: {block.text}")
-                    elif block.type == "tool_use":
-                        params_str = ", ".join(
-                            [f"{k}={v}" for k, v in block.input.items()]
-                        )
-                        print(
-                            f"\n[{self.name}] Tool call: "
-                            f"{block.name}({params_str})"
-                        )
-
-            await self.history.add_message(
+                self._log_response(response)
+
+            await history.add_message(
                 "assistant", response.content, response.usage
             )
 
@@ -106,31 +203,281 @@ class Agent:
                 tool_results = await execute_tools(
                     tool_calls,
                     tool_dict,
+                    cache=self.tool_cache,
+                    limits=self.tool_limits,
                 )
                 if self.verbose:
-                    for block in tool_results:
-                        print(
-                            f"\n[{self.name}] Tool result: "
-                            f"{block.get('content')}"
-                        )
-                await self.history.add_message("user", tool_results)
+                    self._log_tool_results(tool_results)
+                await history.add_message("user", tool_results)
             else:
                 return response
 
-    async def run_async(self, user_input: str) -> list[dict[str, Any]]:
-        """Run agent with MCP tools asynchronously."""
-        async with AsyncExitStack() as stack:
-            original_tools = list(self.tools)
+    async def _agent_stream_loop(
+        self, user_input: str, history: MessageHistory, tools: list[Tool]
+    ) -> AsyncIterator[dict[str, Any]]:
+        """Stream model output, dispatching each tool call once complete."""
+        if self.verbose:
+            print(f"\n[{self.name}] Received: {user_input}")
+        await history.add_message("user", user_input, None)
+
+        tool_dict = {tool.name: tool for tool in tools}
+
+        while True:
+            history.truncate()
+            params = self._prepare_api_params(history, tools)
+            pending: list[asyncio.Task] = []
 
             try:
-                mcp_tools = await setup_mcp_connections(
-                    self.mcp_servers, stack
+                async with self.client.messages.stream(**params) as stream:
+                    async for event in stream:
+                        if event.type == "text":
+                            yield {"type": "text", "text": event.text}
+                        elif (
+                            event.type == "content_block_stop"
+                            and event.content_block.type == "tool_use"
+                        ):
+                            block = event.content_block
+                            # Start the tool while the model keeps generating,
+                            # before a slow consumer handles the event
+                            pending.append(
+                                asyncio.create_task(
+                                    execute_tools(
+                                        [block],
+                                        tool_dict,
+                                        cache=self.tool_cache,
+                                        limits=self.tool_limits,
+                                    )
+                                )
+                            )
+                            yield {"type": "tool_use", "block": block}
+                    response = await stream.get_final_message()
+
+                if self.verbose:
+                    self._log_response(response)
+
+                await history.add_message(
+                    "assistant", response.content, response.usage
                 )
-                self.tools.extend(mcp_tools)
-                return await self._agent_loop(user_input)
+
+                tool_results = []
+                for task in pending:
+                    for result in await task:
+                        tool_results.append(result)
+                        yield {"type": "tool_result", "result": result}
             finally:
-                self.tools = original_tools
+                for task in pending:
+                    task.cancel()
+
+            if tool_results:
+                if self.verbose:
+                    self._log_tool_results(tool_results)
+                await history.add_message("user", tool_results)
+            else:
+                yield {"type": "message", "message": response}
+                return
+
+    @asynccontextmanager
+    async def connect_tools(self) -> AsyncIterator[list[Tool]]:
+        """Yield local plus MCP tools for a run.
+
+        MCP connections come from the agent's pool, so servers are started
+        once and stay open across runs until idle or `aclose()` is called.
+        """
+        async with self.mcp_pool.lease(self.mcp_servers) as mcp_tools:
+            yield [*self.tools, *mcp_tools]
+
+    async def run_async(
+        self,
+        user_input: str,
+        history: MessageHistory | None = None,
+        tools: list[Tool] | None = None,
+    ) -> list[dict[str, Any]]:
+        """Run agent with MCP tools asynchronously.
+
+        Uses the agent's own history unless another one is given. When
+        `tools` is given, it is used as-is instead of connecting MCP servers.
+        """
+        history = history or self.history
+        if tools is not None:
+            return await self._agent_loop(user_input, history, tools)
+
+        async with self.connect_tools() as tools:
+            return await self._agent_loop(user_input, history, tools)
+
+    async def run_stream(
+        self,
+        user_input: str,
+        history: MessageHistory | None = None,
+        tools: list[Tool] | None = None,
+    ) -> AsyncIterator[dict[str, Any]]:
+        """Run agent with MCP tools, streaming events as they happen.
+
+        Yields dicts with a `type` of `text` (a text delta), `tool_use`
+        (a completed tool call, already executing), `tool_result` and
+        finally `message` (the final response). Requires an async client.
+        """
+        if not is_async_method(self.client.messages.create):
+            raise TypeError("run_stream requires an async Anthropic client")
+
+        history = history or self.history
+        if tools is not None:
+            async for event in self._agent_stream_loop(
+                user_input, history, tools
+            ):
+                yield event
+            return
+
+        async with self.connect_tools() as tools:
+            async for event in self._agent_stream_loop(
+                user_input, history, tools
+            ):
+                yield event
+
+    async def run_batch_async(
+        self,
+        inputs: list[str],
+        batches: Any | None = None,
+        poll_interval: float = 30.0,
+    ) -> list[Any]:
+        """Run independent conversations through the Message Batches API.
+
+        Every round submits the next turn of all unfinished conversations as
+        one batch, polls until it ends, executes returned tool calls locally
+        and resubmits those conversations in the next batch. `batches`
+        defaults to the client's batch endpoint; pass a `LocalBatchEndpoint`
+        to run offline. Results are returned in input order, with an
+        exception in place of conversations whose request failed.
+        """
+        batches = batches or self.client.messages.batches
+        histories = {str(i): self.new_history() for i in range(len(inputs))}
+        for history, user_input in zip(histories.values(), inputs):
+            await history.add_message("user", user_input, None)
+
+        results: dict[str, Any] = {}
+        async with self.connect_tools() as tools:
+            tool_dict = {tool.name: tool for tool in tools}
+
+            async def handle_result(entry: Any) -> str | None:
+                """Record a response; return its id if it needs another turn."""
+                key = entry.custom_id
+                if entry.result.type != "succeeded":
+                    results[key] = RuntimeError(
+                        f"Batch request {key} {entry.result.type}"
+                    )
+                    return None
+
+                response = entry.result.message
+                history = histories[key]
+                await history.add_message(
+                    "assistant", response.content, response.usage
+                )
+                tool_calls = [
+                    block
+                    for block in response.content
+                    if block.type == "tool_use"
+                ]
+                if not tool_calls:
+                    results[key] = response
+                    return None
+
+                tool_results = await execute_tools(
+                    tool_calls,
+                    tool_dict,
+                    cache=self.tool_cache,
+                    limits=self.tool_limits,
+                )
+                await history.add_message("user", tool_results)
+                return key
+
+            pending = list(histories)
+            while pending:
+                requests = []
+                for key in pending:
+                    histories[key].truncate()
+                    requests.append(
+                        {
+                            "custom_id": key,
+                            "params": self._prepare_api_params(
+                                histories[key], tools
+                            ),
+                        }
+                    )
+
+                batch = await call_api(batches.create, requests=requests)
+                if self.verbose:
+                    print(
+                        f"\n[{self.name}] Submitted batch {batch.id} "
+                        f"with {len(requests)} requests"
+                    )
+                while batch.processing_status != "ended":
+                    await asyncio.sleep(poll_interval)
+                    batch = await call_api(
+                        batches.retrieve, message_batch_id=batch.id
+                    )
+
+                entries = await fetch_batch_results(batches, batch.id)
+                follow_ups = await asyncio.gather(
+                    *[handle_result(entry) for entry in entries]
+                )
+                pending = [key for key in follow_ups if key is not None]
+
+        return [results[str(i)] for i in range(len(inputs))]
 
     def run(self, user_input: str) -> list[dict[str, Any]]:
         """Run agent synchronously"""
-        return asyncio.run(self.run_async(user_input))
+        return self.run_sync(self.run_async(user_input))
+
+    def run_batch(
+        self,
+        inputs: list[str],
+        batches: Any | None = None,
+        poll_interval: float = 30.0,
+    ) -> list[Any]:
+        """Run independent conversations in batch mode synchronously."""
+        return self.run_sync(
+            self.run_batch_async(inputs, batches, poll_interval)
+        )
+
+    def run_sync(self, coro: Awaitable[Any]) -> Any:
+        """Run a coroutine on a fresh event loop, closing MCP connections
+        before the loop shuts down."""
+
+        async def run_and_close() -> Any:
+            try:
+                return await coro
+            finally:
+                await self.aclose()
+
+        return asyncio.run(run_and_close())
+
+    async def aclose(self) -> None:
+        """Close the agent's pooled MCP connections and saved results."""
+        await self.mcp_pool.close()
+        remove_spill_dir()
+
+
+class AgentSession:
+    """A single conversation with its own history on a shared Agent."""
+
+    def __init__(self, agent: Agent, history: MessageHistory | None = None):
+        self.agent = agent
+        self.history = history or agent.new_history()
+
+    async def run_async(
+        self, user_input: str, tools: list[Tool] | None = None
+    ) -> list[dict[str, Any]]:
+        """Run one turn of this conversation asynchronously."""
+        return await self.agent.run_async(user_input, self.history, tools)
+
+    async def run_stream(
+        self, user_input: str, tools: list[Tool] | None = None
+    ) -> AsyncIterator[dict[str, Any]]:
+        """Run one turn of this conversation, streaming events."""
+        async for event in self.agent.run_stream(
+            user_input, self.history, tools
+        ):
+            yield event
+
+    def run(self, user_input: str) -> list[dict[str, Any]]:
+        """Run one turn of this conversation synchronously."""
+        return self.agent.run_sync(self.run_async(user_input))
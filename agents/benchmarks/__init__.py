@@ -0,0 +1,4 @@
+"""Runnable benchmarks for agent components.
+
+Run one with e.g. `python -m agents.benchmarks.history_payload`.
+"""
@@ -0,0 +1,75 @@
+"""Per-turn cost of building the API message payload.
+
+Grows a history one exchange at a time and times `format_for_api` for the
+new turn, against rebuilding the payload from scratch as it was before
+it was kept incrementally. The incremental cost should stay flat as the
+history grows.
+
+Usage: python -m agents.benchmarks.history_payload
+"""
+
+import asyncio
+import time
+from typing import Any
+
+from ..utils.history_util import MessageHistory
+
+SIZES = (250, 500, 1000, 2000)
+TURNS = 200
+
+
+def rebuild_payload(history: MessageHistory) -> list[dict[str, Any]]:
+    """Format every message again, copying the last one's blocks."""
+    payload = [
+        {"role": message["role"], "content": message["content"]}
+        for message in history.messages
+    ]
+    if payload:
+        payload[-1]["content"] = [
+            {**block, "cache_control": {"type": "ephemeral"}}
+            for block in payload[-1]["content"]
+        ]
+    return payload
+
+
+async def grow(history: MessageHistory, messages: int) -> None:
+    """Add user/assistant messages until the history has `messages`."""
+    while len(history.messages) < messages:
+        role = "user" if len(history.messages) % 2 == 0 else "assistant"
+        await history.add_message(role, f"message {len(history.messages)}")
+
+
+async def measure(messages: int) -> tuple[float, float]:
+    """Get the mean incremental and rebuild cost per turn in seconds."""
+    history = MessageHistory(
+        model="claude-3-7-sonnet-20250219",
+        system="You are a helpful assistant.",
+        context_window_tokens=10**9,
+    )
+    await grow(history, messages)
+    history.format_for_api()
+
+    incremental = rebuild = 0.0
+    for _ in range(TURNS):
+        await grow(history, len(history.messages) + 2)
+        start = time.perf_counter()
+        history.format_for_api()
+        incremental += time.perf_counter() - start
+        start = time.perf_counter()
+        rebuild_payload(history)
+        rebuild += time.perf_counter() - start
+    return incremental / TURNS, rebuild / TURNS
+
+
+async def main() -> None:
+    print(f"{'messages':>8}  {'incremental':>12}  {'rebuild':>10}")
+    for size in SIZES:
+        incremental, rebuild = await measure(size)
+        print(
+            f"{size:>8}  {incremental * 1e6:>10.1f}us"
+            f"  {rebuild * 1e6:>8.1f}us"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,77 @@
+"""Latency of MCP tool calls over stdio versus in-process transports.
+
+Starts the calculator server both as a subprocess over stdio and in this
+process over in-memory streams, then makes sequential calls to it and
+reports startup time and call latency percentiles.
+
+Usage: python -m agents.benchmarks.mcp_transport [calls]
+"""
+
+import asyncio
+import logging
+import statistics
+import sys
+import time
+from typing import Any
+
+from ..utils.connections import open_mcp_connection
+
+TRANSPORTS = {
+    "stdio": {
+        "type": "stdio",
+        "command": sys.executable,
+        "args": ["-m", "agents.tools.calculator_mcp"],
+    },
+    "inproc": {
+        "type": "inproc",
+        "server": "agents.tools.calculator_mcp:mcp",
+    },
+}
+ARGUMENTS = {"number1": 6, "number2": 7, "operator": "*"}
+
+
+async def measure(config: dict[str, Any], calls: int) -> dict[str, float]:
+    """Get the startup time and per-call latencies in seconds."""
+    start = time.perf_counter()
+    connection, _ = await open_mcp_connection(config)
+    startup = time.perf_counter() - start
+    try:
+        latencies = []
+        for _ in range(calls):
+            start = time.perf_counter()
+            await connection.call_tool("calculator", ARGUMENTS)
+            latencies.append(time.perf_counter() - start)
+    finally:
+        await connection.close()
+    latencies.sort()
+    return {
+        "startup": startup,
+        "median": statistics.median(latencies),
+        "p95": latencies[int(0.95 * (len(latencies) - 1))],
+        "total": sum(latencies),
+    }
+
+
+async def main(calls: int = 300) -> None:
+    # The in-process server would otherwise log every request
+    logging.getLogger("mcp").setLevel(logging.WARNING)
+    results = {
+        name: await measure(config, calls)
+        for name, config in TRANSPORTS.items()
+    }
+    print(f"\n{calls} sequential calculator calls")
+    print(
+        f"{'transport':>9}  {'startup':>9}  {'median':>8}  {'p95':>8}"
+        f"  {'total':>8}"
+    )
+    for name, result in results.items():
+        print(
+            f"{name:>9}  {result['startup'] * 1000:>7.1f}ms"
+            f"  {result['median'] * 1000:>6.2f}ms"
+            f"  {result['p95'] * 1000:>6.2f}ms"
+            f"  {result['total']:>7.2f}s"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main(*[int(arg) for arg in sys.argv[1:2]]))
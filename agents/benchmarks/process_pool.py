@@ -0,0 +1,103 @@
+"""Throughput of CPU-bound tools with and without the process pool.
+
+Runs concurrent "agents" that each make a series of CPU-bound tool calls
+through `execute_tools`, once with the work done inline on the event loop
+and once with a `ProcessTool` in the shared pool. A ticker task measures
+how long the event loop stalls, which is what other agents sharing the
+loop (and their API streams) experience.
+
+Usage: python -m agents.benchmarks.process_pool [agents] [calls]
+"""
+
+import asyncio
+import sys
+import time
+from dataclasses import dataclass
+from typing import Any
+
+from ..tools.base import ProcessTool, Tool
+from ..utils.process_util import get_process_pool
+from ..utils.tool_util import execute_tools
+
+# Iterations of the CPU-bound work per tool call, tens of milliseconds
+WORK = 1_500_000
+SCHEMA = {"type": "object", "properties": {"n": {"type": "integer"}}}
+
+
+def burn(n: int) -> str:
+    """CPU-bound work that holds the GIL."""
+    total = 0
+    for i in range(n):
+        total += i * i % 7
+    return str(total)
+
+
+class InlineTool(Tool):
+    async def execute(self, n: int) -> str:
+        return burn(n)
+
+
+class PooledTool(ProcessTool):
+    def run(self, n: int) -> str:
+        return burn(n)
+
+
+@dataclass
+class ToolCall:
+    id: str
+    name: str
+    input: dict[str, Any]
+
+
+async def run_agents(tool: Tool, agents: int, calls: int) -> float:
+    """Run the agents concurrently, returning the wall time in seconds."""
+
+    async def agent(index: int) -> None:
+        for call in range(calls):
+            tool_call = ToolCall(f"{index}-{call}", tool.name, {"n": WORK})
+            await execute_tools([tool_call], {tool.name: tool})
+
+    start = time.perf_counter()
+    await asyncio.gather(*[agent(i) for i in range(agents)])
+    return time.perf_counter() - start
+
+
+async def measure(tool: Tool, agents: int, calls: int) -> tuple[float, float]:
+    """Get the wall time and the longest event loop stall."""
+    stall = 0.0
+    done = False
+
+    async def ticker() -> None:
+        nonlocal stall
+        while not done:
+            before = time.perf_counter()
+            await asyncio.sleep(0.005)
+            stall = max(stall, time.perf_counter() - before - 0.005)
+
+    ticking = asyncio.create_task(ticker())
+    elapsed = await run_agents(tool, agents, calls)
+    done = True
+    await ticking
+    return elapsed, stall
+
+
+async def main(agents: int = 8, calls: int = 5) -> None:
+    await get_process_pool().warm()
+    tools = [
+        ("inline", InlineTool("burn", "", SCHEMA)),
+        ("process pool", PooledTool("burn", "", SCHEMA)),
+    ]
+    print(f"{agents} agents x {calls} calls")
+    print(f"{'backend':>12}  {'calls/s':>8}  {'max loop stall':>14}")
+    for label, tool in tools:
+        elapsed, stall = await measure(tool, agents, calls)
+        print(
+            f"{label:>12}  {agents * calls / elapsed:>8.1f}"
+            f"  {stall * 1000:>12.0f}ms"
+        )
+    get_process_pool().shutdown()
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:3]]
+    asyncio.run(main(*args))
@@ -0,0 +1,47 @@
+"""Concurrent runner for many independent conversations on one Agent."""
+
+import asyncio
+from typing import Any
+
+from .agent import Agent
+
+
+class AgentPool:
+    """Runs many conversations concurrently on a shared Agent configuration.
+
+    All conversations share the agent's client, local tools and a single set
+    of MCP connections; each one gets its own message history.
+    """
+
+    def __init__(self, agent: Agent):
+        self.agent = agent
+
+    async def run_many(
+        self, inputs: list[str], concurrency: int = 10
+    ) -> list[Any]:
+        """Run each input as a separate conversation, at most `concurrency`
+        at a time.
+
+        Results are returned in input order. A conversation that fails
+        yields its exception in place of a response instead of aborting
+        the others.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async with self.agent.connect_tools() as tools:
+
+            async def run_one(user_input: str) -> Any:
+                async with semaphore:
+                    session = self.agent.session()
+                    return await session.run_async(user_input, tools)
+
+            return await asyncio.gather(
+                *[run_one(user_input) for user_input in inputs],
+                return_exceptions=True,
+            )
+
+    def run_many_sync(
+        self, inputs: list[str], concurrency: int = 10
+    ) -> list[Any]:
+        """Run many conversations synchronously."""
+        return self.agent.run_sync(self.run_many(inputs, concurrency))
@@ -0,0 +1,148 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+from agents.utils import connections
+from agents.utils.connections import (
+    CircuitBreaker,
+    MCPConnection,
+    MCPConnectionPool,
+    _PoolEntry,
+)
+
+CONFIG = {"type": "stdio", "command": "server"}
+
+
+class FakeConnection:
+    def __init__(self, running=True, responsive=True):
+        self.is_running = running
+        self.is_connected = True
+        self.responsive = responsive
+        self.last_used = time.monotonic() - 60
+        self.tools = []
+        self.pings = 0
+        self.closed = False
+
+    async def ping(self):
+        self.pings += 1
+        if not self.responsive:
+            raise ConnectionError("no response")
+
+    async def close(self):
+        self.closed = True
+
+
+class HangingSession:
+    async def call_tool(self, name, arguments):
+        await asyncio.Event().wait()
+
+
+class SessionConnection(MCPConnection):
+    """A connection whose session is handed out by `get_session`."""
+
+    def __init__(self, get_session):
+        super().__init__()
+        self.get_session = get_session
+        # Half-open after a single failure
+        self.breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.0)
+        self.breaker.record_failure()
+
+    async def _create_rw_context(self):
+        raise NotImplementedError
+
+    async def _wait_for_session(self):
+        return await self.get_session()
+
+
+def pool_with(connection):
+    pool = MCPConnectionPool(health_check_interval=0.0)
+    pool._check_loop()
+    key = json.dumps(CONFIG, sort_keys=True, default=str)
+    pool._entries[key] = _PoolEntry(connection, last_used=connection.last_used)
+    return pool
+
+
+def test_leased_connection_is_not_pinged_or_closed():
+    async def run():
+        connection = FakeConnection()
+        pool = pool_with(connection)
+        async with pool.lease([CONFIG]):
+            connection.responsive = False
+            async with pool.lease([CONFIG]):
+                pass
+        return connection
+
+    connection = asyncio.run(run())
+    assert connection.pings == 1
+    assert not connection.closed
+
+
+def test_replaced_leased_connection_is_closed_on_release(monkeypatch):
+    fresh = FakeConnection()
+
+    async def fake_open(config, timeout, catalog):
+        return fresh, []
+
+    monkeypatch.setattr(connections, "open_mcp_connection", fake_open)
+
+    async def run():
+        stale = FakeConnection()
+        pool = pool_with(stale)
+        async with pool.lease([CONFIG]):
+            stale.is_running = False
+            async with pool.lease([CONFIG]):
+                assert not stale.closed
+            assert not stale.closed
+        return stale
+
+    stale = asyncio.run(run())
+    assert stale.closed
+    assert not fresh.closed
+
+
+def test_breaker_lets_one_trial_through_after_reset_timeout():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60.0)
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+    breaker._opened_at -= 60.0
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+
+def test_cancelled_trial_call_releases_breaker():
+    async def get_session():
+        return HangingSession()
+
+    async def run():
+        connection = SessionConnection(get_session)
+        call = asyncio.create_task(connection.call_tool("tool", {}))
+        await asyncio.sleep(0)
+        call.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await call
+        return connection
+
+    connection = asyncio.run(run())
+    assert connection.breaker.allow()
+
+
+def test_trial_call_without_session_releases_breaker():
+    async def get_session():
+        raise ConnectionError("MCP connection is closed")
+
+    async def run():
+        connection = SessionConnection(get_session)
+        for _ in range(2):
+            with pytest.raises(ConnectionError, match="is closed"):
+                await connection.call_tool("tool", {})
+
+    asyncio.run(run())
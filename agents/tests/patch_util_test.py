@@ -0,0 +1,143 @@
+import pytest
+
+from agents.utils.patch_util import apply_patch, parse_unified_diff
+
+CONTENT = "".join(f"line{i}\n" for i in range(1, 31))
+
+
+def lines_of(text):
+    return text.splitlines()
+
+
+def test_applies_exact_hunk():
+    diff = (
+        "--- a/file.txt\n"
+        "+++ b/file.txt\n"
+        "@@ -4,3 +4,3 @@\n"
+        " line4\n"
+        "-line5\n"
+        "+LINE5\n"
+        " line6\n"
+    )
+    patched, report = apply_patch(CONTENT, diff)
+    assert lines_of(patched)[3:6] == ["line4", "LINE5", "line6"]
+    assert report == ["Hunk 1: applied at line 4"]
+
+
+def test_reports_offset_when_lines_drifted():
+    diff = "@@ -1,3 +1,3 @@\n line10\n-line11\n+LINE11\n line12\n"
+    patched, report = apply_patch(CONTENT, diff)
+    assert lines_of(patched)[10] == "LINE11"
+    assert report == ["Hunk 1: applied at line 10 (offset +9 lines)"]
+
+
+def test_ignores_whitespace_differences():
+    content = "def f():\n    return 1\n"
+    diff = "@@ -1,2 +1,2 @@\n def f():\n-  return 1\n+    return 2\n"
+    patched, report = apply_patch(content, diff)
+    assert patched == "def f():\n    return 2\n"
+    assert "ignoring whitespace" in report[0]
+
+
+def test_context_lines_keep_the_files_text():
+    content = "a  =  1\nb = 2\n"
+    diff = "@@ -1,2 +1,2 @@\n a = 1\n-b = 2\n+b = 3\n"
+    patched, _ = apply_patch(content, diff)
+    assert patched == "a  =  1\nb = 3\n"
+
+
+def test_fuzz_drops_stale_context():
+    diff = (
+        "@@ -14,5 +14,5 @@\n"
+        " stale\n"
+        " line15\n"
+        "-line16\n"
+        "+LINE16\n"
+        " line17\n"
+        " stale\n"
+    )
+    patched, report = apply_patch(CONTENT, diff)
+    assert lines_of(patched)[15] == "LINE16"
+    assert report == ["Hunk 1: applied at line 15 (fuzz 1)"]
+
+
+def test_fails_when_no_context_matches():
+    # Trimming all context must not place the hunk blindly
+    diff = "@@ -15,3 +15,4 @@\n xx\n yy\n+new\n zz\n"
+    patched, report = apply_patch(CONTENT, diff)
+    assert patched is None
+    assert report[0].startswith("Hunk 1: FAILED")
+
+
+def test_fuzz_keeps_an_anchor_line():
+    diff = "@@ -15,2 +15,3 @@\n line15\n line16\n+new\n"
+    patched, _ = apply_patch(CONTENT, diff)
+    assert lines_of(patched)[14:18] == ["line15", "line16", "new", "line17"]
+
+
+def test_pure_insertion_follows_the_header_line():
+    diff = "@@ -3,0 +4,1 @@\n+inserted\n"
+    patched, _ = apply_patch(CONTENT, diff)
+    assert lines_of(patched)[2:5] == ["line3", "inserted", "line4"]
+
+
+def test_failed_hunk_applies_nothing():
+    diff = (
+        "@@ -2,1 +2,1 @@\n"
+        "-line2\n"
+        "+LINE2\n"
+        "@@ -20,1 +20,1 @@\n"
+        "-missing\n"
+        "+MISSING\n"
+    )
+    patched, report = apply_patch(CONTENT, diff)
+    assert patched is None
+    assert report[0] == "Hunk 1: applied at line 2"
+    assert report[1].startswith("Hunk 2: FAILED")
+
+
+def test_hunks_apply_in_order():
+    diff = (
+        "@@ -2,1 +2,1 @@\n"
+        "-line2\n"
+        "+LINE2\n"
+        "@@ -20,1 +20,2 @@\n"
+        " line20\n"
+        "+line20b\n"
+    )
+    patched, _ = apply_patch(CONTENT, diff)
+    assert lines_of(patched)[1] == "LINE2"
+    assert lines_of(patched)[19:21] == ["line20", "line20b"]
+
+
+def test_preserves_crlf_and_missing_final_newline():
+    content = "a\r\nb\r\nc"
+    diff = "@@ -1,3 +1,3 @@\n a\n-b\n+B\n c\n"
+    patched, _ = apply_patch(content, diff)
+    assert patched == "a\r\nB\r\nc"
+
+
+def test_context_lines_without_leading_space():
+    diff = "@@ -4,3 +4,3 @@\nline4\n-line5\n+LINE5\nline6\n"
+    patched, _ = apply_patch(CONTENT, diff)
+    assert lines_of(patched)[4] == "LINE5"
+
+
+def test_parse_skips_headers_and_no_newline_markers():
+    diff = (
+        "diff --git a/f b/f\n"
+        "--- a/f\n"
+        "+++ b/f\n"
+        "@@ -1 +1 @@\n"
+        "-old\n"
+        "\\ No newline at end of file\n"
+        "+new\n"
+    )
+    (hunk,) = parse_unified_diff(diff)
+    assert hunk.old_start == 1
+    assert hunk.lines == [("-", "old"), ("+", "new")]
+
+
+def test_rejects_diff_without_hunks():
+    with pytest.raises(ValueError):
+        apply_patch(CONTENT, "not a diff")
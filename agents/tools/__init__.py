@@ -1,12 +1,15 @@
 """Tools module for agent framework."""
 
-from .base import Tool
+from .base import ProcessTool, Tool
 from .file_tools import FileReadTool, FileWriteTool
+from .search_tool import FileSearchTool
 from .think import ThinkTool
 
 __all__ = [
     "Tool",
+    "ProcessTool",
     "FileReadTool",
     "FileWriteTool",
+    "FileSearchTool",
     "ThinkTool",
 ]
@@ -1,7 +1,10 @@
 """Base tool definitions for the agent framework."""
 
+import json
 from dataclasses import dataclass
-from typing import Any
+from typing import Any, Hashable
+
+from ..utils.process_util import get_process_pool
 
 
 @dataclass
@@ -12,6 +15,15 @@ class Tool:
     description: str
     input_schema: dict[str, Any]
 
+    # Deterministic tools can opt into result caching in execute_tools
+    cacheable = False
+    # Seconds a cached result stays valid (None means no expiry)
+    cache_ttl = None
+    # Maximum concurrent calls to this tool (None means unlimited)
+    max_concurrency = None
+    # Seconds a call may take before it fails (None means no deadline)
+    timeout = None
+
     def to_dict(self) -> dict[str, Any]:
         """Convert tool to Claude API format."""
         return {
@@ -25,3 +37,34 @@ class Tool:
         raise NotImplementedError(
             "Tool subclasses must implement execute method"
         )
+
+    def cache_key(self, **kwargs) -> Hashable:
+        """Key identifying a call's arguments for result caching.
+
+        Return None for calls whose results must not be cached.
+        """
+        return json.dumps(kwargs, sort_keys=True, default=str)
+
+    def cache_validator(self, **kwargs) -> Any:
+        """Value that changes whenever a cached result becomes stale."""
+        return None
+
+
+class ProcessTool(Tool):
+    """Base class for CPU-bound tools that run in a shared process pool.
+
+    Subclasses implement the synchronous `run` method, which executes in a
+    worker process so it cannot hold the GIL of the agent's event loop.
+    The tool instance, its arguments and its result must be picklable.
+    Set `timeout` to bound how long a call may run.
+    """
+
+    async def execute(self, **kwargs) -> str:
+        """Run the tool in the shared process pool."""
+        return await get_process_pool().run(self, kwargs, self.timeout)
+
+    def run(self, **kwargs) -> str:
+        """Do the tool's work inside a worker process."""
+        raise NotImplementedError(
+            "ProcessTool subclasses must implement run method"
+        )
@@ -2,14 +2,107 @@
 
 """Simple calculator tool for basic math operations."""
 
+import ast
+import functools
 import math
+from types import CodeType
 
+import numpy as np
 from mcp.server import FastMCP
+from mcp.types import ToolAnnotations
 
 mcp = FastMCP("Calculator")
 
+# Largest number of values a batch call may evaluate
+MAX_BATCH_SIZE = 10000
 
-@mcp.tool(name="calculator")
+FUNCTIONS = {
+    "sqrt": np.sqrt,
+    "abs": np.abs,
+    "exp": np.exp,
+    "log": np.log,
+    "log10": np.log10,
+    "log2": np.log2,
+    "sin": np.sin,
+    "cos": np.cos,
+    "tan": np.tan,
+    "asin": np.arcsin,
+    "acos": np.arccos,
+    "atan": np.arctan,
+    "floor": np.floor,
+    "ceil": np.ceil,
+    "round": np.round,
+    "min": np.minimum,
+    "max": np.maximum,
+}
+CONSTANTS = {"pi": np.pi, "e": np.e}
+
+ALLOWED_NODES = (
+    ast.Expression,
+    ast.BinOp,
+    ast.UnaryOp,
+    ast.Call,
+    ast.Name,
+    ast.Load,
+    ast.Constant,
+    ast.Add,
+    ast.Sub,
+    ast.Mult,
+    ast.Div,
+    ast.FloorDiv,
+    ast.Mod,
+    ast.Pow,
+    ast.USub,
+    ast.UAdd,
+)
+
+
+class _FloatConstants(ast.NodeTransformer):
+    """Make numeric constants floats.
+
+    This keeps huge powers from running as unbounded integer arithmetic;
+    they overflow instead.
+    """
+
+    def visit_Constant(self, node: ast.Constant) -> ast.AST:
+        return ast.copy_location(ast.Constant(float(node.value)), node)
+
+
+@functools.lru_cache(maxsize=256)
+def _compile_expression(expression: str) -> CodeType:
+    """Check an expression against the whitelist and compile it."""
+    # ^ means power, as in `calculator`
+    tree = ast.parse(expression.replace("^", "**"), mode="eval")
+    for node in ast.walk(tree):
+        if not isinstance(node, ALLOWED_NODES):
+            raise ValueError(f"Unsupported syntax: {type(node).__name__}")
+        if isinstance(node, ast.Constant) and (
+            isinstance(node.value, bool)
+            or not isinstance(node.value, (int, float))
+        ):
+            raise ValueError(f"Unsupported constant: {node.value!r}")
+        if isinstance(node, ast.Call) and (
+            not isinstance(node.func, ast.Name)
+            or node.func.id not in FUNCTIONS
+            or node.keywords
+        ):
+            raise ValueError("Only the supported functions may be called")
+    tree = ast.fix_missing_locations(_FloatConstants().visit(tree))
+    return compile(tree, "<expression>", "eval")
+
+
+def _format_number(value: float) -> str:
+    """Format a number like `calculator` does."""
+    value = float(value)
+    if value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+@mcp.tool(
+    name="calculator",
+    annotations=ToolAnnotations(readOnlyHint=True, idempotentHint=True),
+)
 def calculator(number1: float, number2: float, operator: str) -> str:
     """Performs basic calculations with two numbers.
 
@@ -51,5 +144,120 @@ def calculator(number1: float, number2: float, operator: str) -> str:
         return f"Error: {str(e)}"
 
 
+@mcp.tool(
+    name="calculate_batch",
+    annotations=ToolAnnotations(readOnlyHint=True, idempotentHint=True),
+)
+def calculate_batch(
+    numbers1: list[float], numbers2: list[float], operator: str
+) -> str:
+    """Performs the same calculation on many pairs of numbers at once.
+
+    Args:
+        numbers1: First numbers of the calculations
+        numbers2: Second numbers of the calculations, one per first number
+               (ignored for sqrt)
+        operator: Operation symbol to perform (+, -, *, /, ^, sqrt)
+
+    Returns:
+        One result or error per line, in the same order as the inputs
+    """
+    try:
+        a = np.asarray(numbers1, dtype=float)
+        if operator == "sqrt":
+            b = np.zeros_like(a)
+        else:
+            b = np.asarray(numbers2, dtype=float)
+            if a.shape != b.shape:
+                return "Error: numbers1 and numbers2 must have the same length"
+        if a.size > MAX_BATCH_SIZE:
+            return f"Error: At most {MAX_BATCH_SIZE} calculations per batch"
+
+        errors = np.full(a.shape, None, dtype=object)
+        with np.errstate(all="ignore"):
+            if operator == "+":
+                result = a + b
+            elif operator == "-":
+                result = a - b
+            elif operator == "*":
+                result = a * b
+            elif operator == "/":
+                errors[b == 0] = "Error: Division by zero"
+                result = a / b
+            elif operator == "^":
+                result = a**b
+            elif operator == "sqrt":
+                errors[a < 0] = (
+                    "Error: Cannot take square root of negative number"
+                )
+                result = np.sqrt(a)
+            else:
+                return f"Error: Unsupported operator '{operator}'"
+
+        return "\n".join(
+            error or f"Result: {_format_number(value)}"
+            for value, error in zip(result, errors)
+        )
+    except Exception as e:
+        return f"Error: {str(e)}"
+
+
+@mcp.tool(
+    name="evaluate",
+    annotations=ToolAnnotations(readOnlyHint=True, idempotentHint=True),
+)
+def evaluate(
+    expression: str,
+    variables: dict[str, float | list[float]] | None = None,
+) -> str:
+    """Evaluates an arithmetic expression, optionally over arrays of values.
+
+    Variables may be numbers or lists of numbers; lists are evaluated
+    element-wise, so one call can compute a whole column of a table.
+
+    Args:
+        expression: Arithmetic expression such as "price * qty * (1 + tax)".
+               Supports + - * / // % ^ (or **), parentheses, pi, e and the
+               functions sqrt, abs, exp, log, log10, log2, sin, cos, tan,
+               asin, acos, atan, floor, ceil, round, min and max
+        variables: Values for the names used in the expression
+
+    Returns:
+        The result, or a list of results when variables are lists
+    """
+    try:
+        code = _compile_expression(expression)
+        namespace = {**FUNCTIONS, **CONSTANTS}
+        for name, value in (variables or {}).items():
+            if name in namespace:
+                return f"Error: '{name}' is a reserved name"
+            array = np.asarray(value, dtype=float)
+            if array.size > MAX_BATCH_SIZE:
+                return f"Error: At most {MAX_BATCH_SIZE} values per variable"
+            namespace[name] = array
+
+        for name in code.co_names:
+            if name not in namespace:
+                return f"Error: Unknown name '{name}'"
+
+        with np.errstate(all="ignore"):
+            result = np.asarray(
+                eval(code, {"__builtins__": {}}, namespace), dtype=float
+            )
+
+        if result.ndim == 0:
+            return f"Result: {_format_number(result)}"
+        values = ", ".join(_format_number(value) for value in result.ravel())
+        return f"Results: [{values}]"
+    except SyntaxError:
+        return f"Error: Invalid expression '{expression}'"
+    except ZeroDivisionError:
+        return "Error: Division by zero"
+    except OverflowError:
+        return "Error: Result is too large"
+    except Exception as e:
+        return f"Error: {str(e)}"
+
+
 if __name__ == "__main__":
     mcp.run()
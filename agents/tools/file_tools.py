@@ -1,16 +1,126 @@
 """File operation tools for reading and writing files."""
 
 import asyncio
-import glob
+import fnmatch
+import itertools
+import mmap
 import os
+import threading
+from array import array
+from collections import OrderedDict
 from pathlib import Path
+from typing import Any, Hashable
 
+from ..utils.fs_util import atomic_write, path_lock, walk_directory
+from ..utils.patch_util import apply_patch
 from .base import Tool
 
+DEFAULT_HEAD_TAIL_LINES = 10
+DEFAULT_MAX_ENTRIES = 500
+# The line index records the byte offset of every LINE_INDEX_STRIDE-th line
+LINE_INDEX_STRIDE = 1024
+LINE_INDEX_CACHE_SIZE = 32
+_SCAN_BLOCK_SIZE = 16384
+
+_line_indexes: OrderedDict[tuple[str, int, int], array] = OrderedDict()
+_line_indexes_lock = threading.Lock()
+
+
+def _skip_lines(data: mmap.mmap, pos: int, count: int) -> int:
+    """Get the offset `count` lines after `pos`, or the end of the data."""
+    for _ in range(count):
+        found = data.find(b"\n", pos)
+        if found == -1:
+            return len(data)
+        pos = found + 1
+    return pos
+
+
+def _nth_newline(data: mmap.mmap, start: int, end: int, n: int) -> int:
+    """Find the n-th newline in data[start:end], which must contain it."""
+    # Narrow the range by counting halves, then scan what is left
+    while end - start > 256:
+        mid = (start + end) // 2
+        count = data[start:mid].count(b"\n")
+        if count >= n:
+            end = mid
+        else:
+            n -= count
+            start = mid
+    for _ in range(n):
+        start = data.find(b"\n", start, end) + 1
+    return start - 1
+
+
+def _build_line_index(data: mmap.mmap) -> array:
+    """Record the byte offset of every LINE_INDEX_STRIDE-th line."""
+    index = array("q", [0])
+    size = len(data)
+    line = 0
+    next_mark = LINE_INDEX_STRIDE
+    for pos in range(0, size, _SCAN_BLOCK_SIZE):
+        block_end = min(pos + _SCAN_BLOCK_SIZE, size)
+        count = data[pos:block_end].count(b"\n")
+        while line + count >= next_mark:
+            needed = next_mark - line
+            pos = _nth_newline(data, pos, block_end, needed) + 1
+            count -= needed
+            line = next_mark
+            index.append(pos)
+            next_mark += LINE_INDEX_STRIDE
+        line += count
+    return index
+
+
+def _get_line_index(
+    path: Path, stat: os.stat_result, data: mmap.mmap
+) -> array:
+    """Get the line index of a file, cached by path, mtime and size."""
+    key = (str(path.resolve()), stat.st_mtime_ns, stat.st_size)
+    with _line_indexes_lock:
+        index = _line_indexes.get(key)
+        if index is not None:
+            _line_indexes.move_to_end(key)
+            return index
+
+    index = _build_line_index(data)
+    with _line_indexes_lock:
+        _line_indexes[key] = index
+        while len(_line_indexes) > LINE_INDEX_CACHE_SIZE:
+            _line_indexes.popitem(last=False)
+    return index
+
+
+def _line_start(
+    path: Path, stat: os.stat_result, data: mmap.mmap, line: int
+) -> int:
+    """Get the byte offset where a 0-based line starts."""
+    if line < LINE_INDEX_STRIDE:
+        return _skip_lines(data, 0, line)
+    index = _get_line_index(path, stat, data)
+    slot = min(line // LINE_INDEX_STRIDE, len(index) - 1)
+    return _skip_lines(data, index[slot], line - slot * LINE_INDEX_STRIDE)
+
+
+def _tail_start(data: mmap.mmap, count: int) -> int:
+    """Get the byte offset where the last `count` lines start."""
+    pos = len(data)
+    # A trailing newline ends the last line rather than starting a new one
+    if pos and data[pos - 1] == ord("\n"):
+        pos -= 1
+    for _ in range(count):
+        found = data.rfind(b"\n", 0, pos)
+        if found == -1:
+            return 0
+        pos = found
+    return pos + 1
+
 
 class FileReadTool(Tool):
     """Tool for reading files and listing directories."""
 
+    cacheable = True
+
     def __init__(self):
         super().__init__(
             name="file_read",
@@ -18,15 +128,23 @@ class FileReadTool(Tool):
             Read files or list directory contents.
 
             Operations:
-            - read: Read the contents of a file
-            - list: List files in a directory
+            - read: Read the contents of a file, or a range of it with
+              offset and limit
+            - head: Read the first lines (or bytes) of a file
+            - tail: Read the last lines (or bytes) of a file
+            - list: List files in a directory, optionally recursively
+
+            offset and limit count lines by default, or bytes when unit is
+            "bytes". Use them to page through large files. Listings skip
+            paths ignored by .gitignore and stop after max_entries; pass the
+            returned cursor to continue a listing.
             """,
             input_schema={
                 "type": "object",
                 "properties": {
                     "operation": {
                         "type": "string",
-                        "enum": ["read", "list"],
+                        "enum": ["read", "head", "tail", "list"],
                         "description": "File operation to perform",
                     },
                     "path": {
@@ -37,10 +155,44 @@ class FileReadTool(Tool):
                         "type": "integer",
                         "description": "Maximum lines to read (0 means no limit)",
                     },
+                    "offset": {
+                        "type": "integer",
+                        "description": "Line or byte to start reading from (0-based)",
+                    },
+                    "limit": {
+                        "type": "integer",
+                        "description": "Maximum lines or bytes to read (0 means no limit)",
+                    },
+                    "unit": {
+                        "type": "string",
+                        "enum": ["lines", "bytes"],
+                        "description": "Whether offset and limit count lines or bytes",
+                    },
                     "pattern": {
                         "type": "string",
                         "description": "File pattern to match",
                     },
+                    "recursive": {
+                        "type": "boolean",
+                        "description": "List subdirectories recursively",
+                    },
+                    "max_depth": {
+                        "type": "integer",
+                        "description": "Deepest level to list when recursive (0 means no limit)",
+                    },
+                    "ignore": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "Extra .gitignore-style patterns to skip",
+                    },
+                    "max_entries": {
+                        "type": "integer",
+                        "description": "Maximum entries to list",
+                    },
+                    "cursor": {
+                        "type": "string",
+                        "description": "Cursor returned by a previous listing",
+                    },
                 },
                 "required": ["operation", "path"],
             },
@@ -52,32 +204,107 @@ class FileReadTool(Tool):
         path: str,
         max_lines: int = 0,
         pattern: str = "*",
+        offset: int = 0,
+        limit: int = 0,
+        unit: str = "lines",
+        recursive: bool = False,
+        max_depth: int = 0,
+        ignore: list[str] | None = None,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        cursor: str | None = None,
     ) -> str:
         """Execute a file read operation.
 
         Args:
-            operation: The operation to perform (read or list)
+            operation: The operation to perform (read, head, tail or list)
             path: The file or directory path
             max_lines: Maximum lines to read (for read operation, 0 means no limit)
             pattern: File pattern to match (for list operation)
+            offset: Line or byte to start reading from (for read operation)
+            limit: Maximum lines or bytes to read (0 means no limit)
+            unit: Whether offset and limit count "lines" or "bytes"
+            recursive: List subdirectories recursively (for list operation)
+            max_depth: Deepest level to list when recursive (0 means no limit)
+            ignore: Extra .gitignore-style patterns to skip when listing
+            max_entries: Maximum entries to list
+            cursor: Cursor returned by a previous listing to continue it
 
         Returns:
             Result of the operation as string
         """
         if operation == "read":
-            return await self._read_file(path, max_lines)
+            return await self._read_file(path, max_lines, offset, limit, unit)
+        elif operation in ("head", "tail"):
+            return await self._read_file(
+                path,
+                offset=0,
+                limit=limit or DEFAULT_HEAD_TAIL_LINES,
+                unit=unit,
+                tail=operation == "tail",
+            )
         elif operation == "list":
-            return await self._list_files(path, pattern)
+            return await self._list_files(
+                path, pattern, recursive, max_depth, ignore, max_entries, cursor
+            )
         else:
             return f"Error: Unsupported operation '{operation}'"
 
-    async def _read_file(self, path: str, max_lines: int = 0) -> str:
-        """Read a file from disk.
-        
+    def cache_key(self, **kwargs) -> Hashable:
+        """Skip caching nested listings and files that report no size.
+
+        Listings that recurse, or whose pattern has directory parts such as
+        src/*.py, see changes that do not touch the root's mtime, so there
+        is no cheap validator for them; they rely on the walker's directory
+        cache. Files such as those in /proc report a size of 0 and an
+        unchanging mtime however their content changes.
+        """
+        if kwargs.get("recursive") or "/" in kwargs.get("pattern", ""):
+            return None
+        try:
+            if os.stat(kwargs.get("path", "")).st_size == 0:
+                return None
+        except OSError:
+            pass
+        return super().cache_key(**kwargs)
+
+    def cache_validator(self, path: str, **kwargs) -> Any:
+        """Invalidate cached results when the file or directory changes."""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    async def _read_file(
+        self,
+        path: str,
+        max_lines: int = 0,
+        offset: int = 0,
+        limit: int = 0,
+        unit: str = "lines",
+        tail: bool = False,
+    ) -> str:
+        """Read a file, or a range of it, from disk.
+
+        The file is memory-mapped, so only the requested range is read.
+        Line offsets far into a file are found through a sparse line index
+        that is cached until the file changes.
+
         Args:
             path: Path to the file to read
             max_lines: Maximum number of lines to read (0 means read entire file)
+            offset: Line or byte to start reading from
+            limit: Maximum number of lines or bytes to read (0 means no limit)
+            unit: Whether offset and limit count "lines" or "bytes"
+            tail: Read the last `limit` lines or bytes instead
         """
+        if unit not in ("lines", "bytes"):
+            return f"Error: Unsupported unit '{unit}'"
+        if offset < 0 or limit < 0 or max_lines < 0:
+            return "Error: offset, limit and max_lines must not be negative"
+        if max_lines > 0 and unit == "lines":
+            limit = min(limit, max_lines) if limit else max_lines
+
         try:
             file_path = Path(path)
 
@@ -86,23 +313,45 @@ class FileReadTool(Tool):
             if not file_path.is_file():
                 return f"Error: {path} is not a file"
 
+            def read_range(data: mmap.mmap, stat: os.stat_result):
+                size = len(data)
+                if unit == "bytes":
+                    if tail:
+                        return max(size - limit, 0), size
+                    start = min(offset, size)
+                    return start, min(start + limit, size) if limit else size
+                if tail:
+                    return _tail_start(data, limit), size
+                start = _line_start(file_path, stat, data, offset)
+                return start, _skip_lines(data, start, limit) if limit else size
+
             def read_sync():
-                with open(file_path, encoding="utf-8", errors="replace") as f:
-                    if max_lines > 0:
-                        lines = []
-                        for i, line in enumerate(f):
-                            if i >= max_lines:
-                                break
-                            lines.append(line)
-                        return "".join(lines)
-                    return f.read()
+                with open(file_path, "rb") as f:
+                    stat = os.fstat(f.fileno())
+                    # Files such as those in /proc report a size of 0
+                    if stat.st_size == 0:
+                        return f.read().decode("utf-8", errors="replace")
+                    with mmap.mmap(
+                        f.fileno(), 0, access=mmap.ACCESS_READ
+                    ) as data:
+                        start, end = read_range(data, stat)
+                        return data[start:end].decode("utf-8", errors="replace")
 
             return await asyncio.to_thread(read_sync)
         except Exception as e:
             return f"Error reading {path}: {str(e)}"
 
-    async def _list_files(self, directory: str, pattern: str = "*") -> str:
-        """List files in a directory."""
+    async def _list_files(
+        self,
+        directory: str,
+        pattern: str = "*",
+        recursive: bool = False,
+        max_depth: int = 0,
+        ignore: list[str] | None = None,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        cursor: str | None = None,
+    ) -> str:
+        """List files in a directory, one page of at most `max_entries`."""
         try:
             dir_path = Path(directory)
 
@@ -111,23 +360,52 @@ class FileReadTool(Tool):
             if not dir_path.is_dir():
                 return f"Error: {directory} is not a directory"
 
+            max_entries = max(max_entries, 1)
+            # Like glob, wildcards only match hidden names if asked to
+            include_hidden = os.path.basename(pattern).startswith(".")
+
+            # Like glob, a pattern with directory parts such as src/*.py
+            # lists that deep even without recursion
+            pattern_depth = pattern.strip("/").count("/") + 1
+            walk_depth = max_depth
+            if not recursive and pattern_depth > 1:
+                walk_depth = pattern_depth
+
+            def matches(rel_path: str) -> bool:
+                if "/" not in pattern:
+                    return fnmatch.fnmatch(os.path.basename(rel_path), pattern)
+                if not recursive and rel_path.count("/") + 1 != pattern_depth:
+                    return False
+                return fnmatch.fnmatch(rel_path, pattern.strip("/"))
+
             def list_sync():
-                search_pattern = f"{directory}/{pattern}"
-                files = glob.glob(search_pattern)
+                entries = walk_directory(
+                    directory,
+                    recursive=recursive or pattern_depth > 1,
+                    max_depth=walk_depth,
+                    ignore=ignore or (),
+                    include_hidden=include_hidden,
+                    after=cursor,
+                )
+                matched = (entry for entry in entries if matches(entry[0]))
+                page = list(itertools.islice(matched, max_entries + 1))
 
-                if not files:
+                if not page:
                     return f"No files found matching {directory}/{pattern}"
 
                 file_list = []
-                for file_path in sorted(files):
-                    path_obj = Path(file_path)
-                    rel_path = str(file_path).replace(str(dir_path) + "/", "")
-
-                    if path_obj.is_dir():
+                for rel_path, is_dir in page[:max_entries]:
+                    if is_dir:
                         file_list.append(f"📁 {rel_path}/")
                     else:
                         file_list.append(f"📄 {rel_path}")
 
+                if len(page) > max_entries:
+                    last_path = page[max_entries - 1][0]
+                    file_list.append(
+                        f"[Listing truncated at {max_entries} entries. "
+                        f'Continue with cursor="{last_path}"]'
+                    )
                 return "\n".join(file_list)
 
             return await asyncio.to_thread(list_sync)
@@ -146,14 +424,18 @@ class FileWriteTool(Tool):
 
             Operations:
             - write: Create or completely replace a file
+            - append: Add content to the end of a file, creating it if needed
             - edit: Make targeted changes to parts of a file
+            - patch: Apply a unified diff with one or more hunks to a file.
+              Prefer this over write for changes in several places. The
+              patch is applied completely or not at all.
             """,
             input_schema={
                 "type": "object",
                 "properties": {
                     "operation": {
                         "type": "string",
-                        "enum": ["write", "edit"],
+                        "enum": ["write", "append", "edit", "patch"],
                         "description": "File operation to perform",
                     },
                     "path": {
@@ -162,7 +444,7 @@ class FileWriteTool(Tool):
                     },
                     "content": {
                         "type": "string",
-                        "description": "Content to write",
+                        "description": "Content to write or append",
                     },
                     "old_text": {
                         "type": "string",
@@ -172,6 +454,10 @@ class FileWriteTool(Tool):
                         "type": "string",
                         "description": "Replacement text (for edit operation)",
                     },
+                    "diff": {
+                        "type": "string",
+                        "description": "Unified diff to apply (for patch operation)",
+                    },
                 },
                 "required": ["operation", "path"],
             },
@@ -184,15 +470,17 @@ class FileWriteTool(Tool):
         content: str = "",
         old_text: str = "",
         new_text: str = "",
+        diff: str = "",
     ) -> str:
         """Execute a file write operation.
 
         Args:
-            operation: The operation to perform (write or edit)
+            operation: The operation to perform (write, append, edit or patch)
             path: The file path
-            content: Content to write (for write operation)
+            content: Content to write (for write and append operations)
             old_text: Text to replace (for edit operation)
             new_text: Replacement text (for edit operation)
+            diff: Unified diff to apply (for patch operation)
 
         Returns:
             Result of the operation as string
@@ -201,6 +489,10 @@ class FileWriteTool(Tool):
             if not content:
                 return "Error: content parameter is required"
             return await self._write_file(path, content)
+        elif operation == "append":
+            if not content:
+                return "Error: content parameter is required"
+            return await self._append_file(path, content)
         elif operation == "edit":
             if not old_text or not new_text:
                 return (
@@ -208,18 +500,22 @@ class FileWriteTool(Tool):
                     "are required for edit operation"
                 )
             return await self._edit_file(path, old_text, new_text)
+        elif operation == "patch":
+            if not diff:
+                return "Error: diff parameter is required for patch operation"
+            return await self._patch_file(path, diff)
         else:
             return f"Error: Unsupported operation '{operation}'"
 
     async def _write_file(self, path: str, content: str) -> str:
-        """Write content to a file."""
+        """Write content to a file atomically."""
         try:
             file_path = Path(path)
             os.makedirs(file_path.parent, exist_ok=True)
 
             def write_sync():
-                with open(file_path, "w", encoding="utf-8") as f:
-                    f.write(content)
+                with path_lock(file_path):
+                    atomic_write(file_path, content)
                 return (
                     f"Successfully wrote {len(content)} "
                     f"characters to {path}"
@@ -229,6 +525,25 @@ class FileWriteTool(Tool):
         except Exception as e:
             return f"Error writing to {path}: {str(e)}"
 
+    async def _append_file(self, path: str, content: str) -> str:
+        """Append content to the end of a file."""
+        try:
+            file_path = Path(path)
+            os.makedirs(file_path.parent, exist_ok=True)
+
+            def append_sync():
+                with path_lock(file_path):
+                    with open(file_path, "a", encoding="utf-8") as f:
+                        f.write(content)
+                return (
+                    f"Successfully appended {len(content)} "
+                    f"characters to {path}"
+                )
+
+            return await asyncio.to_thread(append_sync)
+        except Exception as e:
+            return f"Error appending to {path}: {str(e)}"
+
     async def _edit_file(self, path: str, old_text: str, new_text: str) -> str:
         """Make targeted changes to a file."""
         try:
@@ -240,38 +555,70 @@ class FileWriteTool(Tool):
                 return f"Error: {path} is not a file"
 
             def edit_sync():
-                try:
-                    with open(
-                        file_path, encoding="utf-8", errors="replace"
-                    ) as f:
-                        content = f.read()
-
-                    if old_text not in content:
+                with path_lock(file_path):
+                    try:
+                        with open(file_path, encoding="utf-8") as f:
+                            content = f.read()
+                    except UnicodeDecodeError:
+                        return f"Error: {path} appears to be a binary file"
+
+                    # One scan finds every occurrence
+                    parts = content.split(old_text)
+                    count = len(parts) - 1
+                    if count == 0:
                         return (
                             f"Error: The specified text was not "
                             f"found in {path}"
                         )
 
-                    # Count occurrences to warn about multiple matches
-                    count = content.count(old_text)
-                    if count > 1:
-                        # Edit with warning about multiple occurrences
-                        new_content = content.replace(old_text, new_text)
-                        with open(file_path, "w", encoding="utf-8") as f:
-                            f.write(new_content)
-                        return (
-                            f"Warning: Found {count} occurrences. "
-                            f"All were replaced in {path}"
-                        )
-                    else:
-                        # One occurrence, straightforward replacement
-                        new_content = content.replace(old_text, new_text)
-                        with open(file_path, "w", encoding="utf-8") as f:
-                            f.write(new_content)
-                        return f"Successfully edited {path}"
-                except UnicodeDecodeError:
-                    return f"Error: {path} appears to be a binary file"
+                    atomic_write(file_path, new_text.join(parts))
+
+                if count > 1:
+                    return (
+                        f"Warning: Found {count} occurrences. "
+                        f"All were replaced in {path}"
+                    )
+                return f"Successfully edited {path}"
 
             return await asyncio.to_thread(edit_sync)
         except Exception as e:
             return f"Error editing {path}: {str(e)}"
+
+    async def _patch_file(self, path: str, diff: str) -> str:
+        """Apply a unified diff to a file, all hunks or none."""
+        try:
+            file_path = Path(path)
+
+            if file_path.exists() and not file_path.is_file():
+                return f"Error: {path} is not a file"
+
+            def patch_sync():
+                with path_lock(file_path):
+                    content = ""
+                    if file_path.exists():
+                        try:
+                            # Keep line endings so they are written back
+                            with open(
+                                file_path, encoding="utf-8", newline=""
+                            ) as f:
+                                content = f.read()
+                        except UnicodeDecodeError:
+                            return f"Error: {path} appears to be a binary file"
+
+                    try:
+                        patched, report = apply_patch(content, diff)
+                    except ValueError as e:
+                        return f"Error: Invalid patch: {e}"
+                    if patched is None:
+                        return (
+                            f"Error: Patch not applied, {path} is unchanged\n"
+                            + "\n".join(report)
+                        )
+
+                    os.makedirs(file_path.parent, exist_ok=True)
+                    atomic_write(file_path, patched)
+                return f"Successfully patched {path}\n" + "\n".join(report)
+
+            return await asyncio.to_thread(patch_sync)
+        except Exception as e:
+            return f"Error patching {path}: {str(e)}"
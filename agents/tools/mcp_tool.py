@@ -1,8 +1,45 @@
 """Tools that interface with MCP servers."""
 
+import atexit
+import base64
+import mimetypes
+import os
+import shutil
+import tempfile
+from pathlib import Path
 from typing import Any
+
 from .base import Tool
 
+# Larger text results are saved to a file and only a preview is returned
+MAX_TEXT_CHARS = 100_000
+PREVIEW_CHARS = 2000
+# Images the API accepts inline; others are saved to a file
+MAX_IMAGE_BYTES = 5 * 1024 * 1024
+IMAGE_MEDIA_TYPES = {"image/jpeg", "image/png", "image/gif", "image/webp"}
+
+# Per-process directory for saved results, created on first use
+_spill_dir: Path | None = None
+
+
+def _get_spill_dir() -> Path:
+    """Get the directory results are saved to, creating it if needed."""
+    global _spill_dir
+    if _spill_dir is None or not _spill_dir.is_dir():
+        _spill_dir = Path(tempfile.mkdtemp(prefix="mcp_results_"))
+    return _spill_dir
+
+
+def remove_spill_dir() -> None:
+    """Delete the results saved by MCP tools in this process."""
+    global _spill_dir
+    if _spill_dir is not None:
+        shutil.rmtree(_spill_dir, ignore_errors=True)
+        _spill_dir = None
+
+
+atexit.register(remove_spill_dir)
+
 
 class MCPTool(Tool):
     def __init__(
@@ -11,25 +48,132 @@ class MCPTool(Tool):
         description: str,
         input_schema: dict[str, Any],
         connection: "MCPConnection",
+        cacheable: bool = False,
+        idempotent: bool = False,
     ):
         super().__init__(
             name=name, description=description, input_schema=input_schema
         )
         self.connection = connection
+        self.cacheable = cacheable
+        self.idempotent = idempotent
 
-    async def execute(self, **kwargs) -> str:
+    async def execute(self, **kwargs) -> str | list[dict[str, Any]]:
         """Execute the MCP tool with the given input_schema.
-        Note: Currently only supports text results from MCP tools."""
+
+        Text items are joined and images are forwarded as base64 image
+        blocks. Text resources are inlined; binary content that cannot be
+        sent inline, and text over MAX_TEXT_CHARS, is saved to a file that
+        the result points to.
+        """
         try:
             result = await self.connection.call_tool(
-                self.name, arguments=kwargs
+                self.name, arguments=kwargs, idempotent=self.idempotent
             )
-
-            if hasattr(result, "content") and result.content:
-                for item in result.content:
-                    if getattr(item, "type", None) == "text":
-                        return item.text
-
-            return "No text content in tool response"
+            return self._convert_content(getattr(result, "content", None))
         except Exception as e:
             return f"Error executing {self.name}: {e}"
+
+    def _spill(
+        self, data: bytes, media_type: str | None = None
+    ) -> Path | None:
+        """Save content that is too large or unsupported to a file.
+
+        Returns None if it could not be saved.
+        """
+        suffix = mimetypes.guess_extension(media_type or "") or ""
+        try:
+            fd, path = tempfile.mkstemp(
+                dir=_get_spill_dir(), prefix=f"{self.name}-", suffix=suffix
+            )
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+        except OSError as e:
+            print(f"Error saving result of {self.name}: {e}")
+            return None
+        return Path(path)
+
+    def _spilled(self, label: str, data: bytes, media_type: str) -> str:
+        """Save binary content, describing where it went."""
+        path = self._spill(data, media_type)
+        if path is None:
+            return f"[{label} omitted: it could not be saved to a file]"
+        return f"[{label} saved to {path}]"
+
+    def _convert_content(
+        self, content: list[Any] | None
+    ) -> str | list[dict[str, Any]]:
+        """Convert MCP content items into tool_result content."""
+        texts = []
+        images = []
+        for item in content or []:
+            item_type = getattr(item, "type", None)
+            if item_type == "text":
+                texts.append(item.text)
+            elif item_type == "image":
+                size = len(item.data) * 3 // 4
+                if (
+                    item.mimeType in IMAGE_MEDIA_TYPES
+                    and size <= MAX_IMAGE_BYTES
+                ):
+                    images.append(
+                        {
+                            "type": "image",
+                            "source": {
+                                "type": "base64",
+                                "media_type": item.mimeType,
+                                "data": item.data,
+                            },
+                        }
+                    )
+                else:
+                    texts.append(
+                        self._spilled(
+                            f"Image ({item.mimeType})",
+                            base64.b64decode(item.data),
+                            item.mimeType,
+                        )
+                    )
+            elif item_type == "audio":
+                texts.append(
+                    self._spilled(
+                        f"Audio ({item.mimeType})",
+                        base64.b64decode(item.data),
+                        item.mimeType,
+                    )
+                )
+            elif item_type == "resource":
+                resource = item.resource
+                if getattr(resource, "text", None) is not None:
+                    texts.append(f"[Resource {resource.uri}]\n{resource.text}")
+                else:
+                    texts.append(
+                        self._spilled(
+                            f"Resource {resource.uri}",
+                            base64.b64decode(resource.blob),
+                            resource.mimeType,
+                        )
+                    )
+            elif item_type == "resource_link":
+                texts.append(f"[Resource link: {item.uri}]")
+
+        text = "\n".join(texts)
+        if len(text) > MAX_TEXT_CHARS:
+            path = self._spill(text.encode("utf-8"), "text/plain")
+            if path is None:
+                note = "The full result could not be saved"
+            else:
+                note = (
+                    f"The full result is saved to {path}; read it with "
+                    "file_read using offset and limit"
+                )
+            text = (
+                f"{text[:PREVIEW_CHARS]}\n\n"
+                f"[Output truncated at {PREVIEW_CHARS} of {len(text)} "
+                f"characters. {note}]"
+            )
+
+        if not images:
+            return text or "No content in tool response"
+        blocks = [{"type": "text", "text": text}] if text else []
+        return blocks + images
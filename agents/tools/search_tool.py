@@ -0,0 +1,225 @@
+"""Content search tool with an optional persistent trigram index."""
+
+import asyncio
+import fnmatch
+import os
+import re
+from pathlib import Path
+
+from ..utils.fs_util import walk_directory
+from ..utils.search_util import DEFAULT_INDEX_DIR, get_index, query_trigrams
+from .base import Tool
+
+DEFAULT_MAX_RESULTS = 100
+MAX_LINE_CHARS = 500
+
+
+class FileSearchTool(Tool):
+    """Tool for searching file contents under a directory.
+
+    With `use_index`, candidate files are first narrowed down with a
+    persistent trigram index. Building it costs more than a plain scan,
+    so it only pays off for large trees that are searched repeatedly.
+    """
+
+    def __init__(
+        self,
+        use_index: bool = False,
+        index_dir: str | Path | None = DEFAULT_INDEX_DIR,
+    ):
+        super().__init__(
+            name="file_search",
+            description="""
+            Search the contents of files under a directory for a literal
+            string or a regular expression.
+
+            Returns matches as path:line:text, with context lines shown as
+            path-line-text. Files ignored by .gitignore, hidden files and
+            binary files are skipped. Use this to find where something is
+            defined or used instead of reading files one by one.
+            """,
+            input_schema={
+                "type": "object",
+                "properties": {
+                    "query": {
+                        "type": "string",
+                        "description": "Text or regular expression to find",
+                    },
+                    "path": {
+                        "type": "string",
+                        "description": "Directory to search (defaults to the current directory)",
+                    },
+                    "regex": {
+                        "type": "boolean",
+                        "description": "Treat query as a regular expression",
+                    },
+                    "ignore_case": {
+                        "type": "boolean",
+                        "description": "Match case-insensitively",
+                    },
+                    "pattern": {
+                        "type": "string",
+                        "description": "Only search files matching this pattern, e.g. *.py",
+                    },
+                    "context": {
+                        "type": "integer",
+                        "description": "Lines of context to show around each match",
+                    },
+                    "max_results": {
+                        "type": "integer",
+                        "description": "Maximum matching lines to return",
+                    },
+                },
+                "required": ["query"],
+            },
+        )
+        self.use_index = use_index
+        self.index_dir = index_dir
+
+    async def execute(
+        self,
+        query: str,
+        path: str = ".",
+        regex: bool = False,
+        ignore_case: bool = False,
+        pattern: str = "*",
+        context: int = 0,
+        max_results: int = DEFAULT_MAX_RESULTS,
+    ) -> str:
+        """Execute a content search.
+
+        Args:
+            query: Text or regular expression to find
+            path: Directory to search
+            regex: Treat query as a regular expression
+            ignore_case: Match case-insensitively
+            pattern: Only search files matching this pattern
+            context: Lines of context to show around each match
+            max_results: Maximum matching lines to return
+
+        Returns:
+            Matching lines grouped by file, or an error message
+        """
+        if not query:
+            return "Error: query parameter is required"
+        try:
+            flags = re.IGNORECASE if ignore_case else 0
+            compiled = re.compile(query if regex else re.escape(query), flags)
+        except re.error as e:
+            return f"Error: Invalid regular expression: {e}"
+
+        dir_path = Path(path)
+        if not dir_path.exists():
+            return f"Error: Directory not found at {path}"
+        if not dir_path.is_dir():
+            return f"Error: {path} is not a directory"
+
+        try:
+            return await asyncio.to_thread(
+                self._search_sync,
+                path,
+                query,
+                regex,
+                compiled,
+                pattern,
+                max(context, 0),
+                max(max_results, 1),
+            )
+        except Exception as e:
+            return f"Error searching {path}: {str(e)}"
+
+    def _candidate_files(
+        self,
+        root: str,
+        query: str,
+        regex: bool,
+        compiled: re.Pattern,
+        pattern: str,
+    ) -> list[str]:
+        """List the files under root that may contain a match."""
+        files = [
+            rel_path
+            for rel_path, is_dir in walk_directory(root, recursive=True)
+            if not is_dir
+        ]
+        if self.use_index:
+            index = get_index(root, self.index_dir)
+            # Inline flags such as (?i) also make a search case-insensitive
+            required = query_trigrams(
+                query, regex, bool(compiled.flags & re.IGNORECASE)
+            )
+            with index.lock:
+                index.update(files)
+                files = list(index.candidates(files, required))
+
+        if pattern == "*":
+            return files
+        if "/" in pattern:
+            return [f for f in files if fnmatch.fnmatch(f, pattern)]
+        return [
+            f for f in files if fnmatch.fnmatch(os.path.basename(f), pattern)
+        ]
+
+    def _search_sync(
+        self,
+        root: str,
+        query: str,
+        regex: bool,
+        compiled: re.Pattern,
+        pattern: str,
+        context: int,
+        max_results: int,
+    ) -> str:
+        """Search candidate files, formatting matches like grep."""
+        output = []
+        found = 0
+        candidates = self._candidate_files(
+            root, query, regex, compiled, pattern
+        )
+        for rel_path in candidates:
+            try:
+                with open(os.path.join(root, rel_path), "rb") as f:
+                    data = f.read()
+            except OSError:
+                continue
+            if b"\0" in data:
+                continue
+            text = data.decode("utf-8", errors="replace")
+            if not compiled.search(text):
+                continue
+
+            # Only "\n" ends a line, as for grep; splitlines() would also
+            # split on form feeds and other separators, shifting numbers
+            lines = [
+                line[:-1] if line.endswith("\r") else line
+                for line in text.split("\n")
+            ]
+            if text.endswith("\n"):
+                lines.pop()
+            shown = -1
+            for number, line in enumerate(lines):
+                if not compiled.search(line):
+                    continue
+                if found == max_results:
+                    output.append(
+                        f"[Stopped after {max_results} matches. "
+                        "Narrow the search or raise max_results]"
+                    )
+                    return "\n".join(output)
+                found += 1
+
+                start = max(number - context, shown + 1)
+                if shown >= 0 and start > shown + 1:
+                    output.append("--")
+                end = min(number + context + 1, len(lines))
+                for i in range(start, end):
+                    sep = ":" if compiled.search(lines[i]) else "-"
+                    line_text = lines[i][:MAX_LINE_CHARS]
+                    output.append(f"{rel_path}{sep}{i + 1}{sep}{line_text}")
+                    shown = i
+            # Files are separated like non-adjacent groups within a file
+            output.append("--")
+
+        if not output:
+            return f"No matches found for {query!r} in {root}"
+        return "\n".join(output[:-1])
@@ -1,6 +1,11 @@
 """Agent utility modules."""
 
 from .history_util import MessageHistory
-from .tool_util import execute_tools
+from .tool_util import ToolLimits, ToolResultCache, execute_tools
 
-__all__ = ["MessageHistory", "execute_tools"]
+__all__ = [
+    "MessageHistory",
+    "ToolLimits",
+    "ToolResultCache",
+    "execute_tools",
+]
@@ -0,0 +1,69 @@
+"""Helpers for running agent turns through the Message Batches API."""
+
+import asyncio
+import itertools
+from types import SimpleNamespace
+from typing import Any
+
+from .client_util import call_api
+
+
+async def fetch_batch_results(batches: Any, batch_id: str) -> list[Any]:
+    """Fetch all results of an ended batch from a sync or async client."""
+    results = await call_api(batches.results, message_batch_id=batch_id)
+    if hasattr(results, "__aiter__"):
+        return [entry async for entry in results]
+    # Sync clients stream results lazily over the network
+    return await asyncio.to_thread(list, results)
+
+
+class LocalBatchEndpoint:
+    """Offline stand-in for `client.messages.batches`.
+
+    Requests of a created batch are sent through `client.messages.create`
+    (typically a local or mocked client) in the background. `retrieve` and
+    `results` return objects with the same attributes as the Message
+    Batches API, so batch mode can be exercised without network access.
+    """
+
+    def __init__(self, client: Any, max_concurrency: int = 8):
+        self.client = client
+        self.max_concurrency = max_concurrency
+        self._ids = itertools.count(1)
+        self._tasks: dict[str, asyncio.Task] = {}
+
+    async def create(self, requests: list[dict[str, Any]]) -> Any:
+        """Create a batch and start processing its requests."""
+        batch_id = f"msgbatch_local_{next(self._ids)}"
+        self._tasks[batch_id] = asyncio.create_task(self._process(requests))
+        return SimpleNamespace(id=batch_id, processing_status="in_progress")
+
+    async def _process(self, requests: list[dict[str, Any]]) -> list[Any]:
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def process_one(request: dict[str, Any]) -> Any:
+            async with semaphore:
+                try:
+                    message = await call_api(
+                        self.client.messages.create, **request["params"]
+                    )
+                    result = SimpleNamespace(type="succeeded", message=message)
+                except Exception as e:
+                    result = SimpleNamespace(
+                        type="errored", error=SimpleNamespace(message=str(e))
+                    )
+            return SimpleNamespace(custom_id=request["custom_id"], result=result)
+
+        return await asyncio.gather(*[process_one(r) for r in requests])
+
+    async def retrieve(self, message_batch_id: str) -> Any:
+        """Get the processing status of a batch."""
+        done = self._tasks[message_batch_id].done()
+        return SimpleNamespace(
+            id=message_batch_id,
+            processing_status="ended" if done else "in_progress",
+        )
+
+    async def results(self, message_batch_id: str) -> list[Any]:
+        """Get the results of an ended batch."""
+        return self._tasks.pop(message_batch_id).result()
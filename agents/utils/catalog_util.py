@@ -0,0 +1,135 @@
+"""Disk cache of the tool catalogs MCP servers expose."""
+
+import hashlib
+import json
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from mcp.types import Implementation, Tool as MCPToolDefinition
+
+from .fs_util import atomic_write
+
+DEFAULT_CATALOG_PATH = Path.home() / ".cache" / "agents" / "mcp_tools.json"
+
+
+def _stable_identity(value: Any) -> str:
+    """Describe a config value that is not JSON, such as a server object.
+
+    The description must be the same in every process, so it is the
+    value's type and name rather than its repr, which holds its address.
+    """
+    cls = type(value)
+    identity = f"{cls.__module__}.{cls.__qualname__}"
+    name = getattr(value, "name", None)
+    return f"{identity}:{name}" if isinstance(name, str) else identity
+
+
+@dataclass
+class CatalogEntry:
+    """A cached tool catalog and the server version it came from."""
+
+    server_name: str | None
+    server_version: str | None
+    tools: list[MCPToolDefinition]
+    saved_at: float
+
+
+class ToolCatalog:
+    """Caches `list_tools` results on disk, keyed by server config.
+
+    A cached catalog only lets tools be offered before the server has
+    started; connections list the tools again once open, since servers
+    can change their tools without reporting a new version. Each entry
+    records the name and version the server reported when it was saved.
+    Entries older than `ttl` seconds are ignored, and dropped whenever the
+    catalog is saved.
+    """
+
+    def __init__(
+        self,
+        path: str | Path | None = DEFAULT_CATALOG_PATH,
+        ttl: float = 24 * 60 * 60,
+    ):
+        self.path = Path(path) if path else None
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: dict[str, dict[str, Any]] | None = None
+
+    @staticmethod
+    def key(config: dict[str, Any]) -> str:
+        """Hash a server config into a catalog key."""
+        data = json.dumps(config, sort_keys=True, default=_stable_identity)
+        return hashlib.sha256(data.encode()).hexdigest()
+
+    def _load_entries(self) -> dict[str, dict[str, Any]]:
+        if self._entries is None:
+            self._entries = {}
+            if self.path and self.path.exists():
+                try:
+                    self._entries = json.loads(self.path.read_text())
+                except (OSError, ValueError):
+                    pass
+        return self._entries
+
+    def _save_entries(self) -> None:
+        if not self.path:
+            return
+        now = time.time()
+        self._entries = {
+            key: data
+            for key, data in self._entries.items()
+            if now - data.get("saved_at", 0) <= self.ttl
+        }
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            atomic_write(self.path, json.dumps(self._entries))
+        except OSError:
+            pass
+
+    def load(self, config: dict[str, Any]) -> CatalogEntry | None:
+        """Get the cached catalog of a server, if it is fresh."""
+        with self._lock:
+            data = self._load_entries().get(self.key(config))
+        if data is None or time.time() - data["saved_at"] > self.ttl:
+            return None
+        try:
+            tools = [
+                MCPToolDefinition.model_validate(tool) for tool in data["tools"]
+            ]
+        except ValueError:
+            return None
+        return CatalogEntry(
+            data.get("server_name"),
+            data.get("server_version"),
+            tools,
+            data["saved_at"],
+        )
+
+    def save(
+        self,
+        config: dict[str, Any],
+        server_info: Implementation | None,
+        tools: list[MCPToolDefinition],
+    ) -> None:
+        """Store the catalog a server reported."""
+        data = {
+            "server_name": server_info.name if server_info else None,
+            "server_version": server_info.version if server_info else None,
+            "tools": [
+                tool.model_dump(mode="json", exclude_none=True)
+                for tool in tools
+            ],
+            "saved_at": time.time(),
+        }
+        with self._lock:
+            self._load_entries()[self.key(config)] = data
+            self._save_entries()
+
+    def invalidate(self, config: dict[str, Any]) -> None:
+        """Drop the cached catalog of a server."""
+        with self._lock:
+            if self._load_entries().pop(self.key(config), None) is not None:
+                self._save_entries()
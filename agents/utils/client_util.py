@@ -0,0 +1,21 @@
+"""Helpers for calling sync or async Anthropic clients from async code."""
+
+import asyncio
+import inspect
+from typing import Any, Callable
+
+
+def is_async_method(method: Callable[..., Any]) -> bool:
+    """Check whether a client method is a coroutine function."""
+    return inspect.iscoroutinefunction(inspect.unwrap(method))
+
+
+async def call_api(method: Callable[..., Any], **kwargs: Any) -> Any:
+    """Call a client method without blocking the event loop.
+
+    Methods of async clients (e.g. `AsyncAnthropic`) are awaited directly,
+    while sync client methods are offloaded to a worker thread.
+    """
+    if is_async_method(method):
+        return await method(**kwargs)
+    return await asyncio.to_thread(method, **kwargs)
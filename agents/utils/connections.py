@@ -1,23 +1,136 @@
 """Connection handling for MCP servers."""
 
+import asyncio
+import importlib
+import json
+import random
+import time
 from abc import ABC, abstractmethod
-from contextlib import AsyncExitStack
+from contextlib import AsyncExitStack, asynccontextmanager
+from dataclasses import dataclass, field
 from typing import Any
 
-from mcp import ClientSession, StdioServerParameters
+import anyio
+from mcp import ClientSession, McpError, StdioServerParameters
 from mcp.client.sse import sse_client
 from mcp.client.stdio import stdio_client
+from mcp.shared.memory import create_client_server_memory_streams
+from mcp.types import (
+    CONNECTION_CLOSED,
+    ServerNotification,
+    ToolListChangedNotification,
+)
 
 from ..tools.mcp_tool import MCPTool
+from .catalog_util import ToolCatalog
+
+
+def _is_connection_error(error: BaseException) -> bool:
+    """Check whether an error means the connection itself was lost."""
+    if isinstance(error, McpError):
+        return error.error.code == CONNECTION_CLOSED
+    return isinstance(
+        error,
+        (
+            anyio.ClosedResourceError,
+            anyio.BrokenResourceError,
+            anyio.EndOfStream,
+            ConnectionError,
+            EOFError,
+        ),
+    )
+
+
+class CircuitBreaker:
+    """Fails calls fast while a server keeps failing.
+
+    After `failure_threshold` consecutive connection failures the circuit
+    opens and calls are rejected for `reset_timeout` seconds. Then a single
+    trial call is let through: success closes the circuit and failure
+    opens it again.
+    """
+
+    def __init__(
+        self, failure_threshold: int = 5, reset_timeout: float = 30.0
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self._opened_at: float | None = None
+        self._trial_running = False
+
+    @property
+    def state(self) -> str:
+        """The circuit state: "closed", "open" or "half_open"."""
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at < self.reset_timeout:
+            return "open"
+        return "half_open"
+
+    def allow(self) -> bool:
+        """Check whether a call may go through, claiming the trial call."""
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "open" or self._trial_running:
+            return False
+        self._trial_running = True
+        return True
+
+    def record_success(self) -> None:
+        """Close the circuit after the server responded."""
+        self.failures = 0
+        self._opened_at = None
+        self._trial_running = False
+
+    def record_failure(self) -> None:
+        """Count a connection failure, opening the circuit if needed."""
+        self.failures += 1
+        self._trial_running = False
+        if self.failures >= self.failure_threshold:
+            self._opened_at = time.monotonic()
 
 
 class MCPConnection(ABC):
-    """Base class for MCP server connections."""
+    """Base class for MCP server connections.
+
+    A connection opened with `start()` is supervised: the server is pinged
+    every `ping_interval` seconds, and a lost connection is reopened in the
+    background with exponential backoff, each attempt within
+    `connect_timeout` seconds. Calls made while it reconnects wait up to
+    `reconnect_timeout` seconds. Calls to idempotent tools that fail
+    because the connection dropped are replayed up to `max_replays` times,
+    and a circuit breaker fails calls fast while the server keeps failing.
+    """
+
+    ping_interval = 15.0
+    ping_timeout = 5.0
+    reconnect_timeout = 30.0
+    connect_timeout: float | None = 30.0
+    close_timeout = 5.0
+    backoff_base = 0.5
+    backoff_max = 30.0
+    max_replays = 2
 
     def __init__(self):
         self.session = None
         self._rw_ctx = None
         self._session_ctx = None
+        self._holder: asyncio.Task | None = None
+        self._closing: asyncio.Event | None = None
+        self._wakeup: asyncio.Event | None = None
+        self._connected: asyncio.Event | None = None
+        self._lost = False
+        self._starting: asyncio.Task | None = None
+        self._refreshing: asyncio.Task | None = None
+        self.breaker = CircuitBreaker()
+        self.last_used = time.monotonic()
+        # Set by open_mcp_connection
+        self.config: dict[str, Any] = {}
+        self.catalog: ToolCatalog | None = None
+        self.server_info = None
+        self.tools: list[MCPTool] = []
 
     @abstractmethod
     async def _create_rw_context(self):
@@ -25,21 +138,35 @@ class MCPConnection(ABC):
 
     async def __aenter__(self):
         """Initialize MCP server connection."""
-        self._rw_ctx = await self._create_rw_context()
-        read_write = await self._rw_ctx.__aenter__()
-        read, write = read_write
-        self._session_ctx = ClientSession(read, write)
-        self.session = await self._session_ctx.__aenter__()
-        await self.session.initialize()
+        try:
+            self._rw_ctx = await self._create_rw_context()
+            read_write = await self._rw_ctx.__aenter__()
+            read, write = read_write
+            self._session_ctx = ClientSession(
+                read, write, message_handler=self._handle_message
+            )
+            self.session = await self._session_ctx.__aenter__()
+            initialized = await self.session.initialize()
+            self.server_info = initialized.serverInfo
+        except BaseException as e:
+            # Release whatever was opened, e.g. when a connect times out
+            await self.__aexit__(type(e), e, e.__traceback__)
+            raise
         return self
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         """Clean up MCP server connection resources."""
         try:
-            if self._session_ctx:
-                await self._session_ctx.__aexit__(exc_type, exc_val, exc_tb)
-            if self._rw_ctx:
-                await self._rw_ctx.__aexit__(exc_type, exc_val, exc_tb)
+            try:
+                if self._session_ctx:
+                    await self._session_ctx.__aexit__(
+                        exc_type, exc_val, exc_tb
+                    )
+            finally:
+                # Always release the transport, even if the session exit
+                # was interrupted by cancellation
+                if self._rw_ctx:
+                    await self._rw_ctx.__aexit__(exc_type, exc_val, exc_tb)
         except Exception as e:
             print(f"Error during cleanup: {e}")
         finally:
@@ -47,16 +174,298 @@ class MCPConnection(ABC):
             self._session_ctx = None
             self._rw_ctx = None
 
+    async def start(self) -> "MCPConnection":
+        """Open the connection in a background task that owns it.
+
+        anyio-based transports must be exited by the same task that entered
+        them, so a long-lived connection is held open by a dedicated task
+        and shut down with `close()` instead of by the caller's context.
+        If the first connection attempt fails, its error is raised here.
+        """
+        ready = asyncio.get_running_loop().create_future()
+        self._closing = asyncio.Event()
+        self._wakeup = asyncio.Event()
+        self._connected = asyncio.Event()
+        self._holder = asyncio.create_task(self._hold(ready))
+        try:
+            await ready
+        except BaseException:
+            self._holder.cancel()
+            # Let the holder close a half-open session before returning
+            await asyncio.wait([self._holder])
+            self._holder = None
+            raise
+        return self
+
+    def start_in_background(
+        self, timeout: float | None = None, cached_catalog: Any = None
+    ) -> None:
+        """Start opening the connection without waiting for it.
+
+        Calls made before it is open wait for it. If the tools came from
+        `cached_catalog`, they are listed again once it is open: a server's
+        reported version (FastMCP reports the mcp library's) does not
+        change whenever its tools do.
+        """
+
+        async def start() -> None:
+            await asyncio.wait_for(self.start(), timeout)
+            if cached_catalog is not None:
+                await self.refresh_tools()
+
+        def report(task: asyncio.Task) -> None:
+            if not task.cancelled() and task.exception() is not None:
+                print(f"Error starting MCP connection: {task.exception()}")
+
+        self._starting = asyncio.create_task(start())
+        self._starting.add_done_callback(report)
+
+    async def _run_session(self, opened: asyncio.Future) -> None:
+        """Open a session and supervise it until closing or it is lost.
+
+        Each attempt runs in its own task, which enters and exits the
+        transport, so a hung attempt can be cancelled without the holder.
+        """
+        async with self:
+            self._lost = False
+            self._connected.set()
+            opened.set_result(None)
+            try:
+                await self._supervise()
+            finally:
+                self._connected.clear()
+
+    async def _open_session(self) -> asyncio.Task:
+        """Start a session attempt and wait up to `connect_timeout` for it.
+
+        Returns the running session task, or raises the attempt's error.
+        An attempt still opening when the connection is closed is dropped.
+        """
+        opened = asyncio.get_running_loop().create_future()
+        session = asyncio.create_task(self._run_session(opened))
+        closing = asyncio.create_task(self._closing.wait())
+        try:
+            await asyncio.wait(
+                [session, opened, closing],
+                timeout=self.connect_timeout,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+        finally:
+            closing.cancel()
+            if not opened.done():
+                session.cancel()
+                await asyncio.wait([session])
+        if opened.done():
+            return session
+        if self._closing.is_set():
+            raise ConnectionError("MCP connection is closed")
+        if session.cancelled():
+            raise TimeoutError(
+                f"MCP server did not start within {self.connect_timeout}s"
+            )
+        raise session.exception()
+
+    async def _hold(self, ready: asyncio.Future) -> None:
+        """Keep the connection open, reconnecting, until `close()`."""
+        attempt = 0
+        session = None
+        try:
+            while not self._closing.is_set():
+                try:
+                    session = await self._open_session()
+                except Exception as e:
+                    if not ready.done():
+                        ready.set_exception(e)
+                        return
+                    if self._closing.is_set():
+                        break
+                    print(f"MCP connection failed: {e}")
+                    self.breaker.record_failure()
+                else:
+                    # Calls, not reconnects, close the circuit breaker, so
+                    # a server that crashes on every call still trips it
+                    attempt = 0
+                    if not ready.done():
+                        ready.set_result(None)
+                    await asyncio.wait([session])
+                    if not session.cancelled() and session.exception():
+                        error = session.exception()
+                        print(f"MCP connection failed: {error}")
+
+                if self._closing.is_set():
+                    break
+                delay = min(self.backoff_base * 2**attempt, self.backoff_max)
+                delay *= random.uniform(0.5, 1.0)
+                attempt += 1
+                print(f"Reconnecting to MCP server in {delay:.1f}s")
+                try:
+                    await asyncio.wait_for(self._closing.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+        except asyncio.CancelledError:
+            ready.cancel()
+            if session is not None and not session.done():
+                session.cancel()
+                await asyncio.wait([session])
+            raise
+
+    async def _supervise(self) -> None:
+        """Ping the server until closing or the connection is lost."""
+        while True:
+            try:
+                await asyncio.wait_for(
+                    self._wakeup.wait(), self.ping_interval
+                )
+            except asyncio.TimeoutError:
+                try:
+                    await asyncio.wait_for(self.ping(), self.ping_timeout)
+                except Exception as e:
+                    print(f"MCP server failed a liveness ping: {e!r}")
+                    return
+                continue
+            self._wakeup.clear()
+            if self._closing.is_set() or self._lost:
+                return
+
+    def _connection_lost(self, session: Any) -> None:
+        """Have the holder reconnect after a call found the session dead."""
+        if self.session is session and self._holder is not None:
+            self._lost = True
+            self._connected.clear()
+            self._wakeup.set()
+
+    async def _handle_message(self, message: Any) -> None:
+        """Refresh the tool catalog when the server says it changed."""
+        if isinstance(message, ServerNotification) and isinstance(
+            message.root, ToolListChangedNotification
+        ):
+            if self.catalog is not None:
+                self.catalog.invalidate(self.config)
+            # Listing tools needs this session's receive loop, which is
+            # running this handler, so it cannot be awaited here
+            self._refreshing = asyncio.create_task(self.refresh_tools())
+
+    async def refresh_tools(self) -> list[MCPTool]:
+        """List the server's tools and update the catalog cache."""
+        tool_definitions = await self.list_tools()
+        self.tools = create_mcp_tools(self, tool_definitions)
+        if self.catalog is not None:
+            self.catalog.save(self.config, self.server_info, tool_definitions)
+        return self.tools
+
+    async def close(self) -> None:
+        """Close a connection opened with `start()`."""
+        for task in (self._starting, self._refreshing):
+            if task is not None and not task.done():
+                task.cancel()
+                await asyncio.wait([task])
+        if self._holder is None:
+            return
+        self._closing.set()
+        self._wakeup.set()
+        # A session stuck opening or closing is cancelled after a grace
+        # period, so a hung server cannot block shutdown
+        done, _ = await asyncio.wait(
+            [self._holder], timeout=self.close_timeout
+        )
+        if not done:
+            self._holder.cancel()
+            await asyncio.wait([self._holder])
+        self._holder = None
+
+    @property
+    def is_connected(self) -> bool:
+        """Whether the connection currently has an open session."""
+        return self.session is not None
+
+    @property
+    def is_running(self) -> bool:
+        """Whether a connection opened with `start()` is still supervised."""
+        if self._starting is not None and not self._starting.done():
+            return True
+        return self._holder is not None and not self._holder.done()
+
+    async def ping(self) -> None:
+        """Check that the server is responsive."""
+        await self.session.send_ping()
+
+    async def _wait_for_session(self) -> Any:
+        """Get the open session, waiting while the connection reconnects."""
+        if self._starting is not None:
+            if not self._starting.done():
+                await asyncio.wait([self._starting])
+            if self._holder is None:
+                error = (
+                    None
+                    if self._starting.cancelled()
+                    else self._starting.exception()
+                )
+                raise ConnectionError(f"MCP server failed to start: {error}")
+        if self._holder is None or self._connected.is_set():
+            if self.session is None:
+                raise ConnectionError("MCP connection is closed")
+            return self.session
+        if not self.is_running:
+            raise ConnectionError("MCP connection is closed")
+        try:
+            await asyncio.wait_for(
+                self._connected.wait(), self.reconnect_timeout
+            )
+        except asyncio.TimeoutError:
+            raise ConnectionError(
+                f"MCP server did not reconnect within "
+                f"{self.reconnect_timeout}s"
+            ) from None
+        return self.session
+
     async def list_tools(self) -> Any:
         """Retrieve available tools from the MCP server."""
         response = await self.session.list_tools()
         return response.tools
 
     async def call_tool(
-        self, tool_name: str, arguments: dict[str, Any]
+        self,
+        tool_name: str,
+        arguments: dict[str, Any],
+        idempotent: bool = False,
     ) -> Any:
-        """Call a tool on the MCP server with provided arguments."""
-        return await self.session.call_tool(tool_name, arguments=arguments)
+        """Call a tool on the MCP server with provided arguments.
+
+        Idempotent calls are replayed if the connection drops before they
+        complete; other calls fail, since the server may have run them.
+        """
+        self.last_used = time.monotonic()
+        attempts = self.max_replays + 1 if idempotent else 1
+        for attempt in range(attempts):
+            if not self.breaker.allow():
+                raise ConnectionError(
+                    "MCP server is failing; calls are rejected until its "
+                    "circuit breaker resets"
+                )
+            # Settle the breaker however the attempt ends, so a trial call
+            # that is cancelled or cannot get a session frees its slot
+            settle = self.breaker.record_failure
+            try:
+                session = await self._wait_for_session()
+                try:
+                    result = await session.call_tool(
+                        tool_name, arguments=arguments
+                    )
+                except Exception as e:
+                    if not _is_connection_error(e):
+                        # The server answered, even if with an error
+                        settle = self.breaker.record_success
+                        raise
+                    self._connection_lost(session)
+                    if attempt + 1 == attempts:
+                        raise ConnectionError(
+                            f"MCP connection lost during {tool_name}: {e}"
+                        ) from e
+                    continue
+                settle = self.breaker.record_success
+                return result
+            finally:
+                settle()
 
 
 class MCPConnectionStdio(MCPConnection):
@@ -90,6 +499,50 @@ class MCPConnectionSSE(MCPConnection):
         return sse_client(url=self.url, headers=self.headers)
 
 
+class MCPConnectionInProcess(MCPConnection):
+    """MCP connection to a Python server running in this process.
+
+    The server is either a server object (FastMCP or a low-level Server)
+    or an import path like "package.module:attribute". Messages go over
+    in-memory streams, so there is no subprocess or serialization to pipes.
+    """
+
+    def __init__(self, server: Any):
+        super().__init__()
+        self.server = server
+
+    def _load_server(self) -> Any:
+        server = self.server
+        if isinstance(server, str):
+            module_name, _, attribute = server.partition(":")
+            module = importlib.import_module(module_name)
+            server = getattr(module, attribute or "mcp")
+        # FastMCP wraps a low-level server that speaks the protocol
+        return getattr(server, "_mcp_server", server)
+
+    @asynccontextmanager
+    async def _run_server(self, server: Any):
+        """Run the server in a task group for as long as it is in use."""
+        async with create_client_server_memory_streams() as (
+            client_streams,
+            server_streams,
+        ):
+            async with anyio.create_task_group() as task_group:
+                task_group.start_soon(
+                    lambda: server.run(
+                        *server_streams,
+                        server.create_initialization_options(),
+                    )
+                )
+                try:
+                    yield client_streams
+                finally:
+                    task_group.cancel_scope.cancel()
+
+    async def _create_rw_context(self):
+        return self._run_server(self._load_server())
+
+
 def create_mcp_connection(config: dict[str, Any]) -> MCPConnection:
     """Factory function to create the appropriate MCP connection."""
     conn_type = config.get("type", "stdio").lower()
@@ -110,41 +563,309 @@ def create_mcp_connection(config: dict[str, Any]) -> MCPConnection:
             url=config["url"], headers=config.get("headers")
         )
 
+    elif conn_type == "inproc":
+        if not config.get("server"):
+            raise ValueError("Server is required for in-process connections")
+        return MCPConnectionInProcess(server=config["server"])
+
     else:
         raise ValueError(f"Unsupported connection type: {conn_type}")
 
 
+def create_mcp_tools(
+    connection: MCPConnection, tool_definitions: list[Any]
+) -> list[MCPTool]:
+    """Create tool interfaces for the tools an MCP server exposes.
+
+    Tools the server annotates as read-only and idempotent are cacheable,
+    and calls to tools that are either are replayed after a reconnect.
+    """
+    mcp_tools = []
+    for tool_info in tool_definitions:
+        annotations = getattr(tool_info, "annotations", None)
+        read_only = bool(annotations and annotations.readOnlyHint)
+        idempotent = bool(annotations and annotations.idempotentHint)
+        mcp_tools.append(
+            MCPTool(
+                name=tool_info.name,
+                description=tool_info.description
+                or f"MCP tool: {tool_info.name}",
+                input_schema=tool_info.inputSchema,
+                connection=connection,
+                cacheable=read_only and idempotent,
+                idempotent=read_only or idempotent,
+            )
+        )
+    return mcp_tools
+
+
+def _server_label(config: dict[str, Any]) -> str:
+    """Describe a server config briefly for log messages."""
+    if config.get("url"):
+        return config["url"]
+    if config.get("server"):
+        server = config["server"]
+        if isinstance(server, str):
+            return server
+        return getattr(server, "name", type(server).__name__)
+    return " ".join([config.get("command", ""), *(config.get("args") or [])])
+
+
+async def open_mcp_connection(
+    config: dict[str, Any],
+    connect_timeout: float | None = 30.0,
+    catalog: ToolCatalog | None = None,
+) -> tuple[MCPConnection, list[MCPTool]]:
+    """Start an MCP connection and list its tools within a timeout.
+
+    If `catalog` holds a fresh tool list for the server, the tools are
+    returned immediately and the connection opens in the background.
+    """
+    connection = create_mcp_connection(config)
+    connection.config = config
+    connection.catalog = catalog
+    connection.connect_timeout = connect_timeout
+
+    cached = catalog.load(config) if catalog is not None else None
+    if cached is not None:
+        connection.tools = create_mcp_tools(connection, cached.tools)
+        connection.start_in_background(connect_timeout, cached)
+        return connection, connection.tools
+
+    started = time.monotonic()
+
+    async def connect() -> list[MCPTool]:
+        await connection.start()
+        return await connection.refresh_tools()
+
+    try:
+        tools = await asyncio.wait_for(connect(), connect_timeout)
+    except asyncio.TimeoutError:
+        await connection.close()
+        raise TimeoutError(
+            f"connection timed out after {connect_timeout}s"
+        ) from None
+    except BaseException:
+        await connection.close()
+        raise
+
+    print(
+        f"Connected to MCP server {_server_label(config)} "
+        f"in {time.monotonic() - started:.2f}s"
+    )
+    return connection, tools
+
+
+async def close_mcp_connections(connections: list[MCPConnection]) -> None:
+    """Close several MCP connections concurrently."""
+    await asyncio.gather(*[connection.close() for connection in connections])
+
+
 async def setup_mcp_connections(
     mcp_servers: list[dict[str, Any]] | None,
     stack: AsyncExitStack,
+    connect_timeout: float | None = 30.0,
+    catalog: ToolCatalog | None = None,
 ) -> list[MCPTool]:
-    """Set up MCP server connections and create tool interfaces."""
+    """Set up MCP server connections and create tool interfaces.
+
+    Servers are connected concurrently, each within `connect_timeout`
+    seconds, and are closed concurrently when the exit stack unwinds.
+    Servers with a cached catalog in `catalog` connect in the background.
+    """
     if not mcp_servers:
         return []
 
-    mcp_tools = []
+    results = await asyncio.gather(
+        *[
+            open_mcp_connection(config, connect_timeout, catalog)
+            for config in mcp_servers
+        ],
+        return_exceptions=True,
+    )
 
-    for config in mcp_servers:
-        try:
-            connection = create_mcp_connection(config)
-            await stack.enter_async_context(connection)
-            tool_definitions = await connection.list_tools()
-
-            for tool_info in tool_definitions:
-                mcp_tools.append(
-                    MCPTool(
-                        name=tool_info.name,
-                        description=tool_info.description
-                        or f"MCP tool: {tool_info.name}",
-                        input_schema=tool_info.inputSchema,
-                        connection=connection,
-                    )
-                )
+    connections = []
+    mcp_tools = []
+    for config, result in zip(mcp_servers, results):
+        if isinstance(result, BaseException):
+            print(f"Error setting up MCP server {config}: {result}")
+            continue
+        connection, tools = result
+        connections.append(connection)
+        mcp_tools.extend(tools)
 
-        except Exception as e:
-            print(f"Error setting up MCP server {config}: {e}")
+    stack.push_async_callback(close_mcp_connections, connections)
 
     print(
         f"Loaded {len(mcp_tools)} MCP tools from {len(mcp_servers)} servers."
     )
     return mcp_tools
+
+
+@dataclass
+class _PoolEntry:
+    """An open pooled connection."""
+
+    connection: MCPConnection
+    last_used: float = field(default_factory=time.monotonic)
+    # Runs holding the connection, which is never evicted while held
+    leases: int = 0
+    # Dropped from the pool while held; closed when the last lease ends
+    retired: bool = False
+
+    @property
+    def idle_since(self) -> float:
+        return max(self.last_used, self.connection.last_used)
+
+
+class MCPConnectionPool:
+    """Keeps MCP connections open and reuses them across agent runs.
+
+    Connections are keyed by their server config. Connections idle for
+    longer than `idle_timeout` seconds are closed, and connections idle for
+    longer than `health_check_interval` seconds are pinged before reuse and
+    reopened if the server no longer responds. Servers are connected and
+    closed concurrently, and tool lists are served from `catalog` when it
+    has them so tools are available before slow servers finish starting.
+    """
+
+    def __init__(
+        self,
+        idle_timeout: float = 300.0,
+        health_check_interval: float = 30.0,
+        ping_timeout: float = 5.0,
+        connect_timeout: float | None = 30.0,
+        catalog: ToolCatalog | None = None,
+    ):
+        self.idle_timeout = idle_timeout
+        self.catalog = catalog
+        self.connect_timeout = connect_timeout
+        self.health_check_interval = health_check_interval
+        self.ping_timeout = ping_timeout
+        self._entries: dict[str, _PoolEntry] = {}
+        self._locks: dict[str, asyncio.Lock] = {}
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    def _check_loop(self) -> None:
+        """Forget connections that were opened on another event loop."""
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # Their holder tasks died with the old loop (e.g. asyncio.run)
+            self._entries.clear()
+            self._locks.clear()
+            self._loop = loop
+
+    async def _is_healthy(self, entry: _PoolEntry) -> bool:
+        """Check that a pooled connection can still be used."""
+        if not entry.connection.is_running:
+            return False
+        if not entry.connection.is_connected or entry.leases:
+            # It is reconnecting in the background, or a run is using it and
+            # its supervisor reconnects it if the server stops responding
+            return True
+        if time.monotonic() - entry.idle_since < self.health_check_interval:
+            return True
+        try:
+            await asyncio.wait_for(
+                entry.connection.ping(), timeout=self.ping_timeout
+            )
+            return True
+        except Exception:
+            return False
+
+    async def _acquire(self, config: dict[str, Any]) -> _PoolEntry:
+        """Return the pooled connection for a config, opening it if needed."""
+        key = json.dumps(config, sort_keys=True, default=str)
+        async with self._locks.setdefault(key, asyncio.Lock()):
+            entry = self._entries.get(key)
+            if entry is not None and not await self._is_healthy(entry):
+                del self._entries[key]
+                if entry.leases:
+                    # Leave it to the runs holding it
+                    entry.retired = True
+                else:
+                    await entry.connection.close()
+                entry = None
+
+            if entry is None:
+                connection, _ = await open_mcp_connection(
+                    config, self.connect_timeout, self.catalog
+                )
+                entry = _PoolEntry(connection)
+                self._entries[key] = entry
+
+            entry.last_used = time.monotonic()
+            return entry
+
+    async def get_tools(
+        self, mcp_servers: list[dict[str, Any]] | None
+    ) -> list[MCPTool]:
+        """Get tools for the given servers, reusing open connections."""
+        # Read from the connections, which refresh them on changes
+        entries = await self._acquire_all(mcp_servers)
+        return [tool for entry in entries for tool in entry.connection.tools]
+
+    @asynccontextmanager
+    async def lease(self, mcp_servers: list[dict[str, Any]] | None):
+        """Yield tools for the given servers, holding their connections.
+
+        Held connections are not evicted or health-checked, however long
+        the run takes; one replaced meanwhile is closed when released.
+        """
+        entries = await self._acquire_all(mcp_servers)
+        for entry in entries:
+            entry.leases += 1
+        try:
+            yield [
+                tool for entry in entries for tool in entry.connection.tools
+            ]
+        finally:
+            now = time.monotonic()
+            retired = []
+            for entry in entries:
+                entry.leases -= 1
+                entry.last_used = now
+                if entry.retired and not entry.leases:
+                    retired.append(entry.connection)
+            await close_mcp_connections(retired)
+
+    async def _acquire_all(
+        self, mcp_servers: list[dict[str, Any]] | None
+    ) -> list[_PoolEntry]:
+        """Acquire connections for the servers that could be opened."""
+        if not mcp_servers:
+            return []
+
+        self._check_loop()
+        await self.evict_idle()
+
+        results = await asyncio.gather(
+            *[self._acquire(config) for config in mcp_servers],
+            return_exceptions=True,
+        )
+
+        entries = []
+        for config, result in zip(mcp_servers, results):
+            if isinstance(result, BaseException):
+                print(f"Error setting up MCP server {config}: {result}")
+                continue
+            entries.append(result)
+        return entries
+
+    async def evict_idle(self) -> None:
+        """Close connections that have not been used recently."""
+        now = time.monotonic()
+        idle = [
+            key
+            for key, entry in self._entries.items()
+            if not entry.leases and now - entry.idle_since > self.idle_timeout
+        ]
+        await close_mcp_connections(
+            [self._entries.pop(key).connection for key in idle]
+        )
+
+    async def close(self) -> None:
+        """Close all pooled connections."""
+        entries = list(self._entries.values())
+        self._entries.clear()
+        await close_mcp_connections([entry.connection for entry in entries])
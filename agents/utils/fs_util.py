@@ -0,0 +1,311 @@
+"""Filesystem helpers for directory walking, atomic writes and locking."""
+
+import os
+import re
+import secrets
+import stat
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Iterable, Iterator
+
+DEFAULT_IGNORE_PATTERNS = (".git/",)
+# Listings are reused for this many seconds unless the directory changes
+DIR_CACHE_TTL = 5.0
+DIR_CACHE_SIZE = 4096
+
+
+def _glob_to_regex(pattern: str) -> str:
+    """Translate a gitignore-style glob into a regular expression."""
+    parts = []
+    i = 0
+    while i < len(pattern):
+        if pattern.startswith("**/", i):
+            parts.append("(?:.*/)?")
+            i += 3
+        elif pattern.startswith("**", i):
+            parts.append(".*")
+            i += 2
+        elif pattern[i] == "*":
+            parts.append("[^/]*")
+            i += 1
+        elif pattern[i] == "?":
+            parts.append("[^/]")
+            i += 1
+        elif pattern[i] == "[" and "]" in pattern[i + 2 :]:
+            end = pattern.index("]", i + 2)
+            body = pattern[i + 1 : end].replace("\\", "\\\\")
+            if body.startswith("!"):
+                body = "^" + body[1:]
+            parts.append(f"[{body}]")
+            i = end + 1
+        elif pattern[i] == "\\" and i + 1 < len(pattern):
+            parts.append(re.escape(pattern[i + 1]))
+            i += 2
+        else:
+            parts.append(re.escape(pattern[i]))
+            i += 1
+    return "".join(parts)
+
+
+@dataclass(frozen=True)
+class IgnoreRule:
+    """A single gitignore-style pattern."""
+
+    regex: re.Pattern
+    base: str
+    negate: bool = False
+    dir_only: bool = False
+
+    @classmethod
+    def parse(cls, line: str, base: str = "") -> "IgnoreRule | None":
+        """Parse a pattern relative to `base`, a directory ending in "/".
+
+        Returns None for blank lines and comments.
+        """
+        line = line.rstrip()
+        if not line or line.startswith("#"):
+            return None
+        negate = line.startswith("!")
+        if negate:
+            line = line[1:]
+        dir_only = line.endswith("/")
+        line = line.rstrip("/")
+        # Patterns without an inner slash match at any depth
+        anchored = "/" in line
+        regex = _glob_to_regex(line.lstrip("/"))
+        if not anchored:
+            regex = "(?:.*/)?" + regex
+        return cls(re.compile(regex, re.DOTALL), base, negate, dir_only)
+
+    def matches(self, path: str, is_dir: bool) -> bool:
+        """Check whether the rule matches a path relative to the walk root."""
+        if self.dir_only and not is_dir:
+            return False
+        if not path.startswith(self.base):
+            return False
+        return self.regex.fullmatch(path[len(self.base) :]) is not None
+
+
+class IgnoreRules:
+    """Ordered gitignore-style rules where the last matching rule wins."""
+
+    def __init__(self, rules: tuple[IgnoreRule, ...] = ()):
+        self.rules = rules
+
+    @classmethod
+    def from_patterns(
+        cls, patterns: Iterable[str], base: str = ""
+    ) -> "IgnoreRules":
+        """Create rules from pattern lines."""
+        return cls().extend(patterns, base)
+
+    def extend(self, patterns: Iterable[str], base: str = "") -> "IgnoreRules":
+        """Get new rules with `patterns` added after the existing ones."""
+        parsed = [IgnoreRule.parse(line, base) for line in patterns]
+        return IgnoreRules(
+            self.rules + tuple(rule for rule in parsed if rule is not None)
+        )
+
+    def is_ignored(self, path: str, is_dir: bool) -> bool:
+        """Check whether a path relative to the walk root is ignored."""
+        for rule in reversed(self.rules):
+            if rule.matches(path, is_dir):
+                return not rule.negate
+        return False
+
+
+@dataclass
+class DirListing:
+    """Sorted entries of one directory and its .gitignore lines."""
+
+    mtime_ns: int
+    loaded_at: float
+    # (name, is_dir, is_symlink) tuples sorted by name
+    entries: list[tuple[str, bool, bool]]
+    gitignore: list[str]
+
+
+_dir_cache: OrderedDict[str, DirListing] = OrderedDict()
+_dir_cache_lock = threading.Lock()
+
+
+def scan_directory(path: str) -> DirListing:
+    """List a directory, reusing a recent listing if it has not changed."""
+    key = os.path.abspath(path)
+    mtime_ns = os.stat(key).st_mtime_ns
+    now = time.monotonic()
+    with _dir_cache_lock:
+        listing = _dir_cache.get(key)
+        if (
+            listing is not None
+            and listing.mtime_ns == mtime_ns
+            and now - listing.loaded_at < DIR_CACHE_TTL
+        ):
+            _dir_cache.move_to_end(key)
+            return listing
+
+    entries = []
+    with os.scandir(key) as it:
+        for entry in it:
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                is_dir = False
+            entries.append((entry.name, is_dir, entry.is_symlink()))
+    entries.sort()
+
+    gitignore = []
+    if any(name == ".gitignore" for name, _, _ in entries):
+        try:
+            with open(
+                os.path.join(key, ".gitignore"), encoding="utf-8"
+            ) as f:
+                gitignore = f.read().splitlines()
+        except (OSError, UnicodeDecodeError):
+            pass
+
+    listing = DirListing(mtime_ns, now, entries, gitignore)
+    with _dir_cache_lock:
+        _dir_cache[key] = listing
+        _dir_cache.move_to_end(key)
+        while len(_dir_cache) > DIR_CACHE_SIZE:
+            _dir_cache.popitem(last=False)
+    return listing
+
+
+def walk_directory(
+    root: str,
+    recursive: bool = False,
+    max_depth: int = 0,
+    ignore: Iterable[str] = (),
+    use_gitignore: bool = True,
+    include_hidden: bool = False,
+    after: str | None = None,
+) -> Iterator[tuple[str, bool]]:
+    """Yield (relative path, is_dir) for entries under `root`.
+
+    Entries are yielded depth-first with each directory's entries sorted by
+    name, so the order is stable and a listing can be resumed from the last
+    path it returned by passing it as `after`. Subtrees that sort entirely
+    before `after` are skipped without being scanned.
+
+    Args:
+        root: Directory to walk
+        recursive: Walk into subdirectories
+        max_depth: Deepest level to list when recursive (0 means no limit)
+        ignore: Extra gitignore-style patterns relative to `root`
+        use_gitignore: Skip paths ignored by .gitignore files under `root`
+        include_hidden: Include names starting with "."
+        after: Only yield entries that come after this relative path
+    """
+    rules = IgnoreRules.from_patterns([*DEFAULT_IGNORE_PATTERNS, *ignore])
+    depth_limit = (max_depth or None) if recursive else 1
+    after_parts = tuple(after.strip("/").split("/")) if after else None
+
+    def walk(
+        path: str, parts: tuple[str, ...], rules: IgnoreRules
+    ) -> Iterator[tuple[str, bool]]:
+        try:
+            listing = scan_directory(path)
+        except OSError:
+            # Unreadable subdirectories are skipped rather than fatal
+            if not parts:
+                raise
+            return
+        if use_gitignore and listing.gitignore:
+            base = "".join(f"{part}/" for part in parts)
+            rules = rules.extend(listing.gitignore, base)
+
+        for name, is_dir, is_symlink in listing.entries:
+            if not include_hidden and name.startswith("."):
+                continue
+            child = (*parts, name)
+            if (
+                after_parts is not None
+                and child < after_parts
+                and after_parts[: len(child)] != child
+            ):
+                continue
+            rel_path = "/".join(child)
+            if rules.is_ignored(rel_path, is_dir):
+                continue
+            if after_parts is None or child > after_parts:
+                yield rel_path, is_dir
+            # Symlinked directories are listed but not followed
+            if (
+                is_dir
+                and not is_symlink
+                and (depth_limit is None or len(child) < depth_limit)
+            ):
+                yield from walk(os.path.join(path, name), child, rules)
+
+    yield from walk(root, (), rules)
+
+
+_path_locks: weakref.WeakValueDictionary[str, threading.Lock] = (
+    weakref.WeakValueDictionary()
+)
+_path_locks_lock = threading.Lock()
+
+
+def path_lock(path: str | os.PathLike) -> threading.Lock:
+    """Get the lock that serializes modifications of a file."""
+    key = os.path.realpath(path)
+    with _path_locks_lock:
+        lock = _path_locks.get(key)
+        if lock is None:
+            lock = threading.Lock()
+            _path_locks[key] = lock
+        return lock
+
+
+def _create_temp_file(directory: str, prefix: str) -> tuple[int, str]:
+    """Create a temporary file with the mode a new file would get.
+
+    Unlike mkstemp's 0o600, the mode honours the umask and default ACLs
+    without changing the process umask.
+    """
+    flags = os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_BINARY", 0)
+    while True:
+        path = os.path.join(directory, f"{prefix}{secrets.token_hex(6)}.tmp")
+        try:
+            return os.open(path, flags, 0o666), path
+        except FileExistsError:
+            continue
+
+
+def atomic_write(path: str | os.PathLike, data: str | bytes) -> None:
+    """Replace a file's contents so readers never see a partial write.
+
+    The data is written and flushed to a temporary file in the same
+    directory, which is then renamed over the target. An existing file
+    keeps its permission bits, and a symlink target is written through.
+    """
+    target = os.path.realpath(path)
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    try:
+        mode = stat.S_IMODE(os.stat(target).st_mode)
+    except FileNotFoundError:
+        mode = None
+
+    fd, tmp_path = _create_temp_file(
+        os.path.dirname(target), f".{os.path.basename(target)}."
+    )
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        if mode is not None:
+            os.chmod(tmp_path, mode)
+        os.replace(tmp_path, target)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
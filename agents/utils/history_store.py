@@ -0,0 +1,205 @@
+"""Durable storage backends for message history."""
+
+import json
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any
+
+
+def _to_json(value: Any) -> Any:
+    """Serialize SDK content blocks that the json module cannot handle."""
+    if hasattr(value, "model_dump"):
+        return value.model_dump(mode="json", exclude_none=True)
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+class HistoryStore(ABC):
+    """Base class for message history persistence.
+
+    A conversation is stored as its messages, its per-turn token counts and
+    a small state record. The state can be loaded on its own, so resuming a
+    conversation does not require reading its messages.
+    """
+
+    @abstractmethod
+    def load_state(self, conversation_id: str) -> dict[str, Any] | None:
+        """Load a conversation's state, or None if it does not exist."""
+
+    @abstractmethod
+    def load_messages(
+        self, conversation_id: str
+    ) -> tuple[list[dict[str, Any]], list[tuple[int, int]]]:
+        """Load a conversation's messages and per-turn token counts."""
+
+    @abstractmethod
+    def append(
+        self,
+        conversation_id: str,
+        message: dict[str, Any],
+        turn_tokens: tuple[int, int] | None,
+        state: dict[str, Any],
+    ) -> None:
+        """Append one message, and its turn's tokens if it ends a turn."""
+
+    @abstractmethod
+    def rewrite(
+        self,
+        conversation_id: str,
+        messages: list[dict[str, Any]],
+        message_tokens: list[tuple[int, int]],
+        state: dict[str, Any],
+    ) -> None:
+        """Replace a conversation after its history was compacted."""
+
+
+class SQLiteHistoryStore(HistoryStore):
+    """History store backed by a SQLite database in WAL mode.
+
+    Messages are appended one row per message as turns happen, so any
+    process sharing the database file can resume a conversation by id.
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(
+            self.path, check_same_thread=False, isolation_level=None
+        )
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS conversations (
+                id TEXT PRIMARY KEY,
+                state TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS messages (
+                conversation_id TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                role TEXT NOT NULL,
+                content TEXT NOT NULL,
+                PRIMARY KEY (conversation_id, seq)
+            );
+            CREATE TABLE IF NOT EXISTS turns (
+                conversation_id TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                input_tokens INTEGER NOT NULL,
+                output_tokens INTEGER NOT NULL,
+                PRIMARY KEY (conversation_id, seq)
+            );
+            """
+        )
+
+    def load_state(self, conversation_id: str) -> dict[str, Any] | None:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT state FROM conversations WHERE id = ?",
+                (conversation_id,),
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def load_messages(
+        self, conversation_id: str
+    ) -> tuple[list[dict[str, Any]], list[tuple[int, int]]]:
+        with self._lock:
+            message_rows = self._db.execute(
+                "SELECT role, content FROM messages "
+                "WHERE conversation_id = ? ORDER BY seq",
+                (conversation_id,),
+            ).fetchall()
+            turn_rows = self._db.execute(
+                "SELECT input_tokens, output_tokens FROM turns "
+                "WHERE conversation_id = ? ORDER BY seq",
+                (conversation_id,),
+            ).fetchall()
+        messages = [
+            {"role": role, "content": json.loads(content)}
+            for role, content in message_rows
+        ]
+        return messages, [tuple(row) for row in turn_rows]
+
+    def _save_state(self, conversation_id: str, state: dict[str, Any]):
+        self._db.execute(
+            "INSERT OR REPLACE INTO conversations (id, state) VALUES (?, ?)",
+            (conversation_id, json.dumps(state)),
+        )
+
+    def append(
+        self,
+        conversation_id: str,
+        message: dict[str, Any],
+        turn_tokens: tuple[int, int] | None,
+        state: dict[str, Any],
+    ) -> None:
+        content = json.dumps(message["content"], default=_to_json)
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                self._db.execute(
+                    "INSERT INTO messages VALUES (?, ?, ?, ?)",
+                    (
+                        conversation_id,
+                        state["message_count"] - 1,
+                        message["role"],
+                        content,
+                    ),
+                )
+                if turn_tokens is not None:
+                    self._db.execute(
+                        "INSERT INTO turns VALUES (?, ?, ?, ?)",
+                        (conversation_id, state["turn_count"] - 1)
+                        + tuple(turn_tokens),
+                    )
+                self._save_state(conversation_id, state)
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def rewrite(
+        self,
+        conversation_id: str,
+        messages: list[dict[str, Any]],
+        message_tokens: list[tuple[int, int]],
+        state: dict[str, Any],
+    ) -> None:
+        message_rows = [
+            (
+                conversation_id,
+                seq,
+                message["role"],
+                json.dumps(message["content"], default=_to_json),
+            )
+            for seq, message in enumerate(messages)
+        ]
+        turn_rows = [
+            (conversation_id, seq, *tokens)
+            for seq, tokens in enumerate(message_tokens)
+        ]
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                for table in ("messages", "turns"):
+                    self._db.execute(
+                        f"DELETE FROM {table} WHERE conversation_id = ?",
+                        (conversation_id,),
+                    )
+                self._db.executemany(
+                    "INSERT INTO messages VALUES (?, ?, ?, ?)", message_rows
+                )
+                self._db.executemany(
+                    "INSERT INTO turns VALUES (?, ?, ?, ?)", turn_rows
+                )
+                self._save_state(conversation_id, state)
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            self._db.close()
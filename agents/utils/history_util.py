@@ -1,7 +1,20 @@
 """Message history with token tracking and prompt caching."""
 
+import asyncio
+import uuid
+from collections import deque
 from typing import Any
 
+from .history_store import HistoryStore
+from .summary_util import SummaryCompactor
+from .token_util import TokenEstimator
+
+
+TRUNCATION_NOTICE = {
+    "type": "text",
+    "text": "[Earlier history has been truncated.]",
+}
+
 
 class MessageHistory:
     """Manages chat history with token tracking and context management."""
@@ -11,35 +24,113 @@ class MessageHistory:
         model: str,
         system: str,
         context_window_tokens: int,
-        client: Any,
+        client: Any = None,
         enable_caching: bool = True,
+        estimator: TokenEstimator | None = None,
+        keep_recent_messages: int = 4,
+        compactor: SummaryCompactor | None = None,
+        store: HistoryStore | None = None,
+        conversation_id: str | None = None,
     ):
         self.model = model
         self.system = system
         self.context_window_tokens = context_window_tokens
-        self.messages: list[dict[str, Any]] = []
+        self._messages: deque[dict[str, Any]] | None = deque()
         self.total_tokens = 0
         self.enable_caching = enable_caching
-        self.message_tokens: list[tuple[int, int]] = (
-            []
-        )  # List of (input_tokens, output_tokens) tuples
+        self._message_tokens: deque[tuple[int, int]] | None = (
+            deque()
+        )  # (input_tokens, output_tokens) per turn
+        self.keep_recent_messages = keep_recent_messages
         self.client = client
+        self.estimator = estimator or TokenEstimator()
 
-        # set initial total tokens to system prompt
-        try:
-            system_token = (
-                self.client.messages.count_tokens(
-                    model=self.model,
-                    system=self.system,
-                    messages=[{"role": "user", "content": "test"}],
-                ).input_tokens
-                - 1
-            )
+        # Tool definitions sent with the messages, see `set_tools`
+        self.tools: list[dict[str, Any]] | None = None
+        # set initial total tokens to system prompt, estimated offline
+        self.total_tokens = self.estimator.estimate_system(
+            self.model, self.system
+        )
+        # The system estimate in total_tokens until API usage replaces it
+        self._system_tokens: int | None = self.total_tokens
+        # Estimated tokens of messages not yet confirmed by API usage
+        self._pending_tokens = 0
+        self._truncated = False
+        self._compacted_ids: set[str] = set()
+        self.compactor = compactor
+        self._compaction_task: asyncio.Task | None = None
+        # A finished summary and the span it replaces, applied by truncate
+        self._summary: tuple[list[dict[str, Any]], str] | None = None
+        # API payload kept in sync with `messages`, see `format_for_api`
+        self._api_messages: list[dict[str, Any]] = []
+        self._api_cached_index: int | None = None
+        self._api_stale = False
+
+        self.store = store
+        self.conversation_id = conversation_id or uuid.uuid4().hex
+        self._store_stale = False
+        state = store.load_state(self.conversation_id) if store else None
+        if state is not None:
+            # Resume: messages are only read once they are needed
+            self.total_tokens = state["total_tokens"]
+            self._system_tokens = None
+            self._pending_tokens = state["pending_tokens"]
+            self._truncated = state["truncated"]
+            self._messages = None
+            self._message_tokens = None
 
-        except Exception:
-            system_token = len(self.system) / 4
+    def _load(self) -> None:
+        """Load messages of a resumed conversation from the store."""
+        messages, message_tokens = self.store.load_messages(
+            self.conversation_id
+        )
+        self._messages = deque(messages)
+        self._message_tokens = deque(message_tokens)
+        self._api_stale = True
 
-        self.total_tokens = system_token
+    @property
+    def messages(self) -> deque[dict[str, Any]]:
+        """Messages in the history, oldest first."""
+        if self._messages is None:
+            self._load()
+        return self._messages
+
+    @property
+    def message_tokens(self) -> deque[tuple[int, int]]:
+        """(input_tokens, output_tokens) per turn, oldest first."""
+        if self._message_tokens is None:
+            self._load()
+        return self._message_tokens
+
+    async def _persist(
+        self, message: dict[str, Any], turn_tokens: tuple[int, int] | None
+    ) -> None:
+        """Write a newly added message to the store."""
+        state = {
+            "total_tokens": self.total_tokens,
+            "pending_tokens": self._pending_tokens,
+            "truncated": self._truncated,
+            "message_count": len(self.messages),
+            "turn_count": len(self.message_tokens),
+        }
+        if self._store_stale:
+            # Compaction changed earlier messages since the last write
+            self._store_stale = False
+            await asyncio.to_thread(
+                self.store.rewrite,
+                self.conversation_id,
+                list(self.messages),
+                list(self.message_tokens),
+                state,
+            )
+        else:
+            await asyncio.to_thread(
+                self.store.append,
+                self.conversation_id,
+                message,
+                turn_tokens,
+                state,
+            )
 
     async def add_message(
         self,
@@ -50,10 +141,14 @@ class MessageHistory:
         """Add a message to the history and track token usage."""
         if isinstance(content, str):
             content = [{"type": "text", "text": content}]
+        if role == "user":
+            content = self._answer_pending_tool_uses(content)
 
         message = {"role": role, "content": content}
         self.messages.append(message)
+        self._api_messages.append(message)
 
+        turn_tokens = None
         if role == "assistant" and usage:
             total_input = (
                 usage.input_tokens
@@ -62,63 +157,285 @@ class MessageHistory:
             )
             output_tokens = usage.output_tokens
 
-            current_turn_input = total_input - self.total_tokens
-            self.message_tokens.append((current_turn_input, output_tokens))
-            self.total_tokens += current_turn_input + output_tokens
+            confirmed_tokens = self.total_tokens - self._pending_tokens
+            current_turn_input = total_input - confirmed_tokens
+            if self.message_tokens:
+                self.estimator.observe(
+                    self._pending_tokens, current_turn_input
+                )
+            else:
+                # First turn: what is left after the messages is the
+                # real size of the system prompt and tools
+                self.estimator.record_system(
+                    self.model,
+                    self.system,
+                    total_input - self._pending_tokens,
+                    self.tools,
+                )
+            self._system_tokens = None
 
-    def truncate(self) -> None:
-        """Remove oldest messages when context window limit is exceeded."""
-        if self.total_tokens <= self.context_window_tokens:
+            turn_tokens = (current_turn_input, output_tokens)
+            self.message_tokens.append(turn_tokens)
+            self.total_tokens = (
+                confirmed_tokens + current_turn_input + output_tokens
+            )
+            self._pending_tokens = 0
+            self._maybe_start_compaction()
+        else:
+            estimated_tokens = self.estimator.estimate_content(content)
+            self._pending_tokens += estimated_tokens
+            self.total_tokens += estimated_tokens
+
+        if self.store is not None:
+            await self._persist(message, turn_tokens)
+
+    def set_tools(self, tools: list[dict[str, Any]]) -> None:
+        """Set the tool definitions sent along with the messages.
+
+        They count towards the measured system size, so until the first
+        response the estimate is replaced by the one for these tools.
+        """
+        if tools is self.tools:
             return
+        self.tools = tools
+        if self._system_tokens is not None:
+            estimate = self.estimator.estimate_system(
+                self.model, self.system, tools
+            )
+            self.total_tokens += estimate - self._system_tokens
+            self._system_tokens = estimate
 
-        TRUNCATION_NOTICE_TOKENS = 25
-        TRUNCATION_MESSAGE = {
-            "role": "user",
-            "content": [
-                {
-                    "type": "text",
-                    "text": "[Earlier history has been truncated.]",
-                }
-            ],
+    def _answer_pending_tool_uses(
+        self, content: list[dict[str, Any]]
+    ) -> list[dict[str, Any]]:
+        """Add error results for unanswered tool calls of the last turn.
+
+        A run cancelled while its tools executed leaves the history ending
+        in tool_use blocks without results, which the API rejects.
+        """
+        if not self.messages or self.messages[-1]["role"] != "assistant":
+            return content
+        answered = {
+            block.get("tool_use_id")
+            for block in content
+            if isinstance(block, dict) and block.get("type") == "tool_result"
         }
+        missing = []
+        for block in self.messages[-1]["content"]:
+            block = block if isinstance(block, dict) else vars(block)
+            if block.get("type") == "tool_use" and block["id"] not in answered:
+                missing.append(
+                    {
+                        "type": "tool_result",
+                        "tool_use_id": block["id"],
+                        "content": "Tool call was interrupted",
+                        "is_error": True,
+                    }
+                )
+        return [*missing, *content]
 
-        def remove_message_pair():
-            self.messages.pop(0)
-            self.messages.pop(0)
+    def _maybe_start_compaction(self) -> None:
+        """Start summarizing the oldest span once past the watermark."""
+        if (
+            self.compactor is None
+            or self._compaction_task is not None
+            or self._summary is not None
+            or not self.compactor.should_compact(
+                self.total_tokens, self.context_window_tokens
+            )
+        ):
+            return
 
-            if self.message_tokens:
-                input_tokens, output_tokens = self.message_tokens.pop(0)
-                self.total_tokens -= input_tokens + output_tokens
+        # Summarize whole exchanges after the initial message, keeping the
+        # most recent messages verbatim
+        pairs = min(
+            (len(self.messages) - self.keep_recent_messages - 1) // 2,
+            len(self.message_tokens) - 1,
+        )
+        if pairs < 1:
+            return
+
+        span = [self.messages[index] for index in range(1, 2 * pairs + 1)]
+        self._compaction_task = asyncio.create_task(self._compact(span))
+
+    async def _compact(self, span: list[dict[str, Any]]) -> None:
+        """Summarize a span in the background for `truncate` to swap in.
+
+        The swap waits for the next turn, since the usage reported for a
+        request already in flight still counts the span.
+        """
+        try:
+            self._summary = (span, await self.compactor.summarize(span))
+        except Exception as e:
+            print(f"Error summarizing history: {e}")
+        finally:
+            self._compaction_task = None
+
+    def _apply_summary(self) -> None:
+        """Replace a summarized span with its summary, if one is ready."""
+        if self._summary is None:
+            return
+        span, summary = self._summary
+        self._summary = None
+        # Discard the summary if the span changed while it was written
+        if len(self.messages) <= len(span) or any(
+            self.messages[index + 1] is not message
+            for index, message in enumerate(span)
+        ):
+            return
+        self._remove_exchanges(
+            len(span) // 2,
+            {
+                "type": "text",
+                "text": f"[Summary of earlier conversation]\n{summary}",
+            },
+        )
+
+    async def wait_for_compaction(self) -> None:
+        """Wait for a running background summary to be written."""
+        if self._compaction_task is not None:
+            await asyncio.wait([self._compaction_task])
+
+    def _release_tokens(self, index: int, tokens: int) -> None:
+        """Subtract freed tokens from the message at `index`."""
+        turn, is_output = divmod(index, 2)
+        if turn >= len(self.message_tokens):
+            tokens = min(tokens, self._pending_tokens)
+            self._pending_tokens -= tokens
+        else:
+            counts = list(self.message_tokens[turn])
+            tokens = min(tokens, counts[is_output])
+            counts[is_output] -= tokens
+            self.message_tokens[turn] = tuple(counts)
+        self.total_tokens -= tokens
+
+    def _stub_tool_results(self) -> None:
+        """Replace the largest stale tool results with short stubs."""
+        # Skip the initial task and the most recent exchange
+        stale_end = len(self.messages) - self.keep_recent_messages
+        candidates = []
+        for index in range(2, stale_end, 2):
+            for position, block in enumerate(self.messages[index]["content"]):
+                if (
+                    isinstance(block, dict)
+                    and block.get("type") == "tool_result"
+                    and block["tool_use_id"] not in self._compacted_ids
+                ):
+                    tokens = self.estimator.estimate_block(block)
+                    candidates.append((tokens, index, position))
+
+        for tokens, index, position in sorted(candidates, reverse=True):
+            if self.total_tokens <= self.context_window_tokens:
+                return
+            message = self.messages[index]
+            block = message["content"][position]
+            stub = {
+                "type": "tool_result",
+                "tool_use_id": block["tool_use_id"],
+                "content": (
+                    f"[Tool result removed to save context "
+                    f"(~{tokens} tokens)]"
+                ),
+            }
+            if block.get("is_error"):
+                stub["is_error"] = True
+            content = list(message["content"])
+            content[position] = stub
+            self.messages[index] = {"role": message["role"], "content": content}
+            if not self._api_stale:
+                self._api_messages[index] = self.messages[index]
+            self._store_stale = True
+            self._compacted_ids.add(block["tool_use_id"])
+            self._release_tokens(
+                index, tokens - self.estimator.estimate_block(stub)
+            )
+
+    def _remove_exchanges(
+        self, pairs: int, note: dict[str, Any] | None = None
+    ) -> None:
+        """Remove the oldest assistant/user pairs after the initial message.
+
+        An optional note block is appended to the initial message.
+        """
+        first = self.messages.popleft()
+        for _ in range(2 * pairs):
+            self.messages.popleft()
+        if note is not None:
+            first = {"role": first["role"], "content": [*first["content"], note]}
+        self.messages.appendleft(first)
+        self._api_stale = True
+        self._store_stale = True
+
+        # The initial input now leads into the output of the first turn
+        # after the removed pairs
+        removed = [self.message_tokens.popleft() for _ in range(pairs + 1)]
+        freed_tokens = sum(output for _, output in removed[:-1]) + sum(
+            input_tokens for input_tokens, _ in removed[1:]
+        )
+        note_tokens = self.estimator.estimate_block(note) if note else 0
+        self.message_tokens.appendleft(
+            (removed[0][0] + note_tokens, removed[-1][1])
+        )
+        self.total_tokens += note_tokens - freed_tokens
+
+    def truncate(self) -> None:
+        """Compact history when the context window limit is exceeded.
+
+        Stale tool results are replaced with stubs first, largest first.
+        If that is not enough, the oldest exchanges after the initial user
+        message are dropped, so the original task is always preserved.
+        A background summary that finished since the last turn is swapped
+        in first.
+        """
+        self._apply_summary()
+        if self.total_tokens <= self.context_window_tokens:
+            return
+
+        self._stub_tool_results()
 
         while (
-            self.message_tokens
-            and len(self.messages) >= 2
+            len(self.message_tokens) >= 2
             and self.total_tokens > self.context_window_tokens
         ):
-            remove_message_pair()
-
-            if self.messages and self.message_tokens:
-                original_input_tokens, original_output_tokens = (
-                    self.message_tokens[0]
-                )
-                self.messages[0] = TRUNCATION_MESSAGE
-                self.message_tokens[0] = (
-                    TRUNCATION_NOTICE_TOKENS,
-                    original_output_tokens,
-                )
-                self.total_tokens += (
-                    TRUNCATION_NOTICE_TOKENS - original_input_tokens
-                )
+            self._remove_exchanges(
+                1, None if self._truncated else TRUNCATION_NOTICE
+            )
+            self._truncated = True
 
     def format_for_api(self) -> list[dict[str, Any]]:
-        """Format messages for Claude API with optional caching."""
-        result = [
-            {"role": m["role"], "content": m["content"]} for m in self.messages
-        ]
-
-        if self.enable_caching and self.messages:
-            result[-1]["content"] = [
-                {**block, "cache_control": {"type": "ephemeral"}}
-                for block in self.messages[-1]["content"]
-            ]
-        return result
+        """Format messages for Claude API with optional caching.
+
+        The payload is maintained incrementally: new messages are appended
+        and only the cache breakpoint on the last block is moved, so the
+        per-turn cost does not grow with history length. It is rebuilt only
+        after compaction rewrites the front of the history. The returned
+        list is reused between calls and must not be modified.
+        """
+        if self._api_stale:
+            self._api_messages = list(self.messages)
+            self._api_cached_index = None
+            self._api_stale = False
+
+        last_index = len(self._api_messages) - 1
+        if self.enable_caching and self._api_cached_index != last_index:
+            if self._api_cached_index is not None:
+                self._api_messages[self._api_cached_index] = self.messages[
+                    self._api_cached_index
+                ]
+            if last_index >= 0:
+                last = self.messages[last_index]
+                content = list(last["content"])
+                if content:
+                    # One breakpoint caches the whole prefix; with those on
+                    # the system prompt and tools this stays within the
+                    # API's limit of four
+                    content[-1] = {
+                        **content[-1],
+                        "cache_control": {"type": "ephemeral"},
+                    }
+                self._api_messages[last_index] = {
+                    "role": last["role"],
+                    "content": content,
+                }
+                self._api_cached_index = last_index
+        return self._api_messages
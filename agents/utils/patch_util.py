@@ -0,0 +1,207 @@
+"""Fuzzy application of unified diffs."""
+
+import re
+from dataclasses import dataclass, field
+
+HUNK_HEADER = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+# Context lines that may be dropped from each end of a hunk to make it fit
+MAX_FUZZ = 2
+
+
+@dataclass
+class Hunk:
+    """One hunk of a unified diff as (tag, text) lines.
+
+    Tags are " " for context, "-" for removed and "+" for added lines.
+    `old_start` is None for hunks whose header has no line numbers.
+    """
+
+    old_start: int | None
+    lines: list[tuple[str, str]] = field(default_factory=list)
+
+    @property
+    def old_lines(self) -> list[str]:
+        return [text for tag, text in self.lines if tag != "+"]
+
+
+def parse_unified_diff(diff: str) -> list[Hunk]:
+    """Parse the hunks of a single-file unified diff.
+
+    File headers and git metadata are skipped. Hunk line counts are not
+    trusted, since hand-written diffs often get them wrong.
+    """
+    hunks: list[Hunk] = []
+    current: Hunk | None = None
+    lines = diff.splitlines()
+    for i, line in enumerate(lines):
+        if line.startswith("@@"):
+            match = HUNK_HEADER.match(line)
+            current = Hunk(int(match.group(1)) if match else None)
+            hunks.append(current)
+        elif line.startswith("diff ") or (
+            line.startswith("--- ")
+            and i + 1 < len(lines)
+            and lines[i + 1].startswith("+++ ")
+        ):
+            current = None
+        elif current is None or line.startswith("\\"):
+            # Text before the first hunk, or "\ No newline at end of file"
+            continue
+        elif line[:1] in ("+", "-", " "):
+            current.lines.append((line[0], line[1:]))
+        else:
+            # Editors often strip the leading space of context lines
+            current.lines.append((" ", line))
+    return [hunk for hunk in hunks if hunk.lines]
+
+
+def _normalize(line: str) -> str:
+    return " ".join(line.split())
+
+
+def _find(
+    haystack: list[str], needle: list[str], expected: int, min_pos: int
+) -> int | None:
+    """Find `needle` at or after `min_pos`, nearest to `expected` first."""
+    last = len(haystack) - len(needle)
+    if last < min_pos:
+        return None
+    expected = min(max(expected, min_pos), last)
+    for distance in range(max(expected - min_pos, last - expected) + 1):
+        candidates = (expected - distance, expected + distance)
+        for pos in candidates if distance else (expected,):
+            if (
+                min_pos <= pos <= last
+                and haystack[pos] == needle[0]
+                and haystack[pos : pos + len(needle)] == needle
+            ):
+                return pos
+    return None
+
+
+def _trim_context(
+    hunk_lines: list[tuple[str, str]], fuzz: int
+) -> tuple[list[tuple[str, str]], int]:
+    """Drop up to `fuzz` context lines from both ends of a hunk.
+
+    At least one line of the old text is kept to anchor the hunk. Returns
+    the remaining lines and how many were dropped from the start.
+    """
+    leading = 0
+    while leading < len(hunk_lines) and hunk_lines[leading][0] == " ":
+        leading += 1
+    trailing = 0
+    while (
+        trailing < len(hunk_lines) - leading
+        and hunk_lines[-1 - trailing][0] == " "
+    ):
+        trailing += 1
+    start = min(fuzz, leading)
+    end_trim = min(fuzz, trailing)
+    old_count = sum(1 for tag, _ in hunk_lines if tag != "+")
+    if old_count and start + end_trim >= old_count:
+        end_trim = min(end_trim, old_count - 1)
+        start = min(start, old_count - 1 - end_trim)
+    return hunk_lines[start : len(hunk_lines) - end_trim], start
+
+
+def apply_patch(content: str, diff: str) -> tuple[str | None, list[str]]:
+    """Apply a unified diff to text, tolerating drifted context.
+
+    Each hunk is looked for nearest to its stated line first, then with
+    whitespace differences ignored, then with up to MAX_FUZZ context lines
+    dropped from each end. Context lines keep the file's own text.
+
+    Returns the patched text, or None if any hunk could not be placed, and
+    a report line for each hunk.
+    """
+    hunks = parse_unified_diff(diff)
+    if not hunks:
+        raise ValueError("no hunks found in the patch")
+
+    newline = "\r\n" if "\r\n" in content else "\n"
+    ends_with_newline = not content or content.endswith(newline)
+    lines = content.split(newline)
+    if lines[-1] == "":
+        lines.pop()
+    normalized = [_normalize(line) for line in lines]
+
+    edits: list[tuple[int, list[tuple[str, str]]]] = []
+    report = []
+    min_pos = 0
+    for number, hunk in enumerate(hunks, 1):
+        if hunk.old_start is None:
+            expected = min_pos
+        elif hunk.old_lines:
+            expected = hunk.old_start - 1
+        else:
+            # Pure insertions name the line they follow
+            expected = hunk.old_start
+
+        placed = None
+        for fuzz in range(MAX_FUZZ + 1):
+            hunk_lines, dropped = _trim_context(hunk.lines, fuzz)
+            if fuzz and len(hunk_lines) == len(hunk.lines):
+                break
+            old_lines = [text for tag, text in hunk_lines if tag != "+"]
+            if not old_lines:
+                # Only pure insertions have no old text to look for
+                pos = min(max(expected, min_pos), len(lines))
+                placed = (pos, hunk_lines, fuzz, False)
+                break
+            pos = _find(lines, old_lines, expected + dropped, min_pos)
+            if pos is not None:
+                placed = (pos, hunk_lines, fuzz, False)
+                break
+            pos = _find(
+                normalized,
+                [_normalize(line) for line in old_lines],
+                expected + dropped,
+                min_pos,
+            )
+            if pos is not None:
+                placed = (pos, hunk_lines, fuzz, True)
+                break
+
+        if placed is None:
+            preview = "\n".join(f"    {line}" for line in hunk.old_lines[:3])
+            report.append(
+                f"Hunk {number}: FAILED, its context was not found "
+                f"(expected near line {expected + 1}):\n{preview}"
+            )
+            continue
+
+        pos, hunk_lines, fuzz, ignored_whitespace = placed
+        notes = []
+        if hunk.old_start is not None and pos != expected + dropped:
+            notes.append(f"offset {pos - expected - dropped:+d} lines")
+        if ignored_whitespace:
+            notes.append("ignoring whitespace")
+        if fuzz:
+            notes.append(f"fuzz {fuzz}")
+        suffix = f" ({', '.join(notes)})" if notes else ""
+        report.append(f"Hunk {number}: applied at line {pos + 1}{suffix}")
+        edits.append((pos, hunk_lines))
+        min_pos = pos + sum(1 for tag, _ in hunk_lines if tag != "+")
+
+    if len(edits) < len(hunks):
+        return None, report
+
+    output = []
+    index = 0
+    for pos, hunk_lines in edits:
+        output.extend(lines[index:pos])
+        index = pos
+        for tag, text in hunk_lines:
+            if tag == "+":
+                output.append(text)
+                continue
+            if tag == " ":
+                output.append(lines[index])
+            index += 1
+    output.extend(lines[index:])
+
+    patched = newline.join(output)
+    if output and ends_with_newline:
+        patched += newline
+    return patched, report
@@ -0,0 +1,106 @@
+"""Process pool backend for CPU-bound tools."""
+
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any
+
+
+def _run_tool(tool: Any, arguments: dict[str, Any]) -> Any:
+    """Run a tool's synchronous work inside a worker process."""
+    return tool.run(**arguments)
+
+
+def _noop() -> None:
+    """Task used to start worker processes ahead of time."""
+
+
+class ProcessToolPool:
+    """Shared process pool that runs CPU-bound tools off the event loop.
+
+    Tools are sent to workers by pickling the tool instance and its
+    arguments, so both and the returned result must be picklable. Workers
+    are started ahead of the first call. A call that is cancelled or times
+    out while running cannot be interrupted, so its pool's workers are
+    killed and new calls go to a fresh pool. Other calls that were sent to
+    the killed pool are run again on the fresh one.
+    """
+
+    def __init__(self, max_workers: int | None = None, mp_context: Any = None):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.mp_context = mp_context
+        self._executor: ProcessPoolExecutor | None = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers, mp_context=self.mp_context
+            )
+        return self._executor
+
+    async def warm(self) -> None:
+        """Start all worker processes."""
+        executor = self._get_executor()
+        await asyncio.gather(
+            *[
+                asyncio.wrap_future(executor.submit(_noop))
+                for _ in range(self.max_workers)
+            ]
+        )
+
+    def _retire(self, executor: ProcessPoolExecutor) -> None:
+        """Replace an executor with an abandoned task and kill its workers."""
+        if self._executor is executor:
+            self._executor = None
+        # Read before shutdown, which drops the executor's process table
+        processes = list((executor._processes or {}).values())
+        executor.shutdown(wait=False)
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+
+    async def run(
+        self,
+        tool: Any,
+        arguments: dict[str, Any],
+        timeout: float | None = None,
+    ) -> Any:
+        """Run `tool.run(**arguments)` in a worker process."""
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        while True:
+            executor = self._get_executor()
+            future = executor.submit(_run_tool, tool, arguments)
+            remaining = None if deadline is None else deadline - loop.time()
+            try:
+                return await asyncio.wait_for(
+                    asyncio.wrap_future(future), remaining
+                )
+            except BrokenProcessPool:
+                if self._executor is executor:
+                    # A worker died on its own, e.g. it ran out of memory
+                    self._executor = None
+                    raise
+                # Another call's timeout killed the workers; run it again
+            except (asyncio.CancelledError, asyncio.TimeoutError):
+                if future.running():
+                    self._retire(executor)
+                raise
+
+    def shutdown(self) -> None:
+        """Shut down the worker processes."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+
+_default_pool: ProcessToolPool | None = None
+
+
+def get_process_pool() -> ProcessToolPool:
+    """Get the process pool shared by all process-backed tools."""
+    global _default_pool
+    if _default_pool is None:
+        _default_pool = ProcessToolPool()
+    return _default_pool
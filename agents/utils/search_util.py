@@ -0,0 +1,413 @@
+"""Persistent trigram index for narrowing down content searches."""
+
+import hashlib
+import os
+import re
+import struct
+import threading
+from array import array
+from pathlib import Path
+from typing import Iterable, Iterator
+
+try:
+    from re import _constants as sre_constants, _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_constants
+    import sre_parse
+
+from .fs_util import atomic_write
+
+DEFAULT_INDEX_DIR = Path.home() / ".cache" / "agents" / "search_index"
+# Larger files are not indexed and are always searched
+MAX_INDEXED_FILE_SIZE = 4 * 1024 * 1024
+INDEX_VERSION = 2
+
+# Binary layout of index snapshots and journal records
+_SNAPSHOT_HEADER = struct.Struct("=III")  # version, root length, files
+_FILE = struct.Struct("=qqII")  # mtime_ns, size, flags, path length
+_COUNT = struct.Struct("=I")
+_POSTING = struct.Struct("=II")  # trigram, file id count
+_RECORD = struct.Struct("=qqII")  # mtime_ns, size, trigrams, path length
+_FILE_DEAD = 1
+_FILE_UNINDEXED = 2
+_UNINDEXED = 0xFFFFFFFF
+
+_indexes: dict[tuple[str, str | None], "TrigramIndex"] = {}
+_indexes_lock = threading.Lock()
+
+
+def _trigrams(data: bytes) -> array:
+    """Get the sorted trigrams of lowercased bytes as 24-bit integers."""
+    data = data.lower()
+    unique = set(zip(data, data[1:], data[2:]))
+    return array("I", sorted((a << 16) | (b << 8) | c for a, b, c in unique))
+
+
+def _regex_literals(pattern: str) -> list[str]:
+    """Get literal runs that every match of a regex must contain."""
+    try:
+        parsed = sre_parse.parse(pattern)
+    except re.error:
+        return []
+    runs, current = [], []
+    for op, value in parsed:
+        if op is sre_constants.LITERAL:
+            current.append(chr(value))
+            continue
+        # Anything else ends the run; a top-level branch means no literal
+        # is required, which simply yields no trigrams for it
+        if current:
+            runs.append("".join(current))
+            current = []
+    if current:
+        runs.append("".join(current))
+    return runs
+
+
+def query_trigrams(query: str, regex: bool, ignore_case: bool) -> set[int]:
+    """Get trigrams that any file matching a search must contain."""
+    required = set()
+    for literal in _regex_literals(query) if regex else [query]:
+        data = literal.encode("utf-8")
+        for i in range(len(data) - 2):
+            trigram = data[i : i + 3]
+            # Lowercasing bytes only folds ASCII, so other case-insensitive
+            # trigrams could miss differently cased text
+            if ignore_case and not trigram.isascii():
+                continue
+            required.add(int.from_bytes(trigram.lower(), "big"))
+    return required
+
+
+class TrigramIndex:
+    """Posting lists of the trigrams in the files under a directory.
+
+    Each trigram maps to the ids of the files that contain it. Files are
+    identified by their mtime and size, so `update` only reads files that
+    changed since they were indexed. A changed file gets a new id and its
+    old id is left dead in the posting lists until enough ids are dead to
+    be worth compacting. Binary files are indexed as having no content,
+    and files over MAX_INDEXED_FILE_SIZE as always possibly matching.
+
+    On disk the index is a snapshot of the posting lists plus a journal
+    of files indexed since, so a change appends a small record instead of
+    rewriting the index. The snapshot is rewritten once the journal grows
+    past a quarter of its size.
+    """
+
+    def __init__(
+        self, root: str, index_dir: str | Path | None = DEFAULT_INDEX_DIR
+    ):
+        self.root = os.path.realpath(root)
+        self.path = self.journal_path = None
+        if index_dir:
+            digest = hashlib.sha256(self.root.encode()).hexdigest()[:16]
+            self.path = Path(index_dir) / f"{digest}.idx"
+            self.journal_path = Path(index_dir) / f"{digest}.log"
+        self.lock = threading.Lock()
+        # Relative path -> (file id, mtime_ns, size)
+        self._files: dict[str, tuple[int, int, int]] = {}
+        # File id -> relative path, or None once the id is dead
+        self._paths: list[str | None] = []
+        self._postings: dict[int, array] = {}
+        self._unindexed: set[int] = set()
+        self._dead = 0
+        self._snapshot_size = 0
+        self._journal_size = 0
+        self._loaded = False
+
+    def _add(
+        self,
+        rel_path: str,
+        mtime_ns: int,
+        size: int,
+        trigrams: array | None,
+    ) -> None:
+        """Give a file a new id and add it to the posting lists."""
+        old = self._files.pop(rel_path, None)
+        if old is not None:
+            self._remove_id(old[0])
+        file_id = len(self._paths)
+        self._paths.append(rel_path)
+        self._files[rel_path] = (file_id, mtime_ns, size)
+        if trigrams is None:
+            self._unindexed.add(file_id)
+            return
+        postings = self._postings
+        for trigram in trigrams:
+            posting = postings.get(trigram)
+            if posting is None:
+                postings[trigram] = array("I", (file_id,))
+            else:
+                posting.append(file_id)
+
+    def _remove_id(self, file_id: int) -> None:
+        self._paths[file_id] = None
+        self._unindexed.discard(file_id)
+        self._dead += 1
+
+    def _load(self) -> None:
+        self._loaded = True
+        if not self.path:
+            return
+        try:
+            data = self.path.read_bytes()
+            self._load_snapshot(data)
+            self._snapshot_size = len(data)
+        except (OSError, ValueError, struct.error):
+            self._files, self._paths, self._postings = {}, [], {}
+            self._unindexed, self._dead = set(), 0
+            return
+        try:
+            journal = self.journal_path.read_bytes()
+        except OSError:
+            return
+        try:
+            for record in _read_records(journal):
+                self._apply_record(*record)
+        except ValueError:
+            # A corrupt record; the files it covers are indexed again
+            pass
+        self._journal_size = len(journal)
+
+    def _load_snapshot(self, data: bytes) -> None:
+        view = memoryview(data)
+        version, root_length, file_count = _SNAPSHOT_HEADER.unpack_from(
+            view, 0
+        )
+        offset = _SNAPSHOT_HEADER.size
+        root = bytes(view[offset : offset + root_length]).decode()
+        if version != INDEX_VERSION or root != self.root:
+            raise ValueError("index is for another version or directory")
+        offset += root_length
+
+        for file_id in range(file_count):
+            mtime_ns, size, flags, path_length = _FILE.unpack_from(
+                view, offset
+            )
+            offset += _FILE.size
+            if flags & _FILE_DEAD:
+                self._paths.append(None)
+                self._dead += 1
+                continue
+            rel_path = bytes(view[offset : offset + path_length]).decode()
+            offset += path_length
+            self._paths.append(rel_path)
+            self._files[rel_path] = (file_id, mtime_ns, size)
+            if flags & _FILE_UNINDEXED:
+                self._unindexed.add(file_id)
+
+        (posting_count,) = _COUNT.unpack_from(view, offset)
+        offset += _COUNT.size
+        for _ in range(posting_count):
+            trigram, length = _POSTING.unpack_from(view, offset)
+            offset += _POSTING.size
+            posting = array("I")
+            posting.frombytes(view[offset : offset + 4 * length])
+            offset += 4 * length
+            self._postings[trigram] = posting
+
+    def _apply_record(
+        self,
+        rel_path: str,
+        mtime_ns: int,
+        size: int,
+        trigrams: array | None,
+    ) -> None:
+        """Replay a journal record of an indexed or removed file."""
+        if size < 0:
+            old = self._files.pop(rel_path, None)
+            if old is not None:
+                self._remove_id(old[0])
+        else:
+            self._add(rel_path, mtime_ns, size, trigrams)
+
+    def _compact(self) -> None:
+        """Drop dead ids by renumbering the live files."""
+        new_ids = array("I", bytes(4 * len(self._paths)))
+        paths = []
+        for file_id, rel_path in enumerate(self._paths):
+            if rel_path is not None:
+                new_ids[file_id] = len(paths)
+                paths.append(rel_path)
+        live = self._files
+        postings = {}
+        for trigram, posting in self._postings.items():
+            ids = array(
+                "I",
+                (new_ids[i] for i in posting if self._paths[i] is not None),
+            )
+            if ids:
+                postings[trigram] = ids
+        self._files = {
+            rel_path: (new_ids[file_id], mtime_ns, size)
+            for rel_path, (file_id, mtime_ns, size) in live.items()
+        }
+        self._unindexed = {new_ids[i] for i in self._unindexed}
+        self._paths = paths
+        self._postings = postings
+        self._dead = 0
+
+    def _save_snapshot(self) -> None:
+        root = self.root.encode()
+        parts = [
+            _SNAPSHOT_HEADER.pack(INDEX_VERSION, len(root), len(self._paths)),
+            root,
+        ]
+        entries = {
+            file_id: (mtime_ns, size)
+            for file_id, mtime_ns, size in self._files.values()
+        }
+        for file_id, rel_path in enumerate(self._paths):
+            if rel_path is None:
+                parts.append(_FILE.pack(0, 0, _FILE_DEAD, 0))
+                continue
+            mtime_ns, size = entries[file_id]
+            flags = _FILE_UNINDEXED if file_id in self._unindexed else 0
+            encoded = rel_path.encode()
+            parts.append(_FILE.pack(mtime_ns, size, flags, len(encoded)))
+            parts.append(encoded)
+        parts.append(_COUNT.pack(len(self._postings)))
+        for trigram, posting in self._postings.items():
+            parts.append(_POSTING.pack(trigram, len(posting)))
+            parts.append(posting.tobytes())
+        data = b"".join(parts)
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            atomic_write(self.path, data)
+            self.journal_path.unlink(missing_ok=True)
+        except OSError:
+            return
+        self._snapshot_size = len(data)
+        self._journal_size = 0
+
+    def _save(self, records: list[bytes]) -> None:
+        """Journal changed files, rewriting the snapshot when it is due."""
+        if not self.path:
+            return
+        if self._dead > len(self._files):
+            self._compact()
+        data = b"".join(records)
+        if self._journal_size + len(data) > self._snapshot_size // 4:
+            self._save_snapshot()
+            return
+        try:
+            with open(self.journal_path, "ab") as f:
+                f.write(data)
+        except OSError:
+            return
+        self._journal_size += len(data)
+
+    def update(self, rel_paths: Iterable[str]) -> int:
+        """Index new and changed files and forget missing ones.
+
+        Returns the number of files that were read.
+        """
+        if not self._loaded:
+            self._load()
+
+        seen = set()
+        records = []
+        indexed = 0
+        for rel_path in rel_paths:
+            seen.add(rel_path)
+            try:
+                stat = os.stat(os.path.join(self.root, rel_path))
+            except OSError:
+                continue
+            entry = self._files.get(rel_path)
+            if entry and entry[1:] == (stat.st_mtime_ns, stat.st_size):
+                continue
+
+            trigrams = None
+            if stat.st_size <= MAX_INDEXED_FILE_SIZE:
+                try:
+                    with open(os.path.join(self.root, rel_path), "rb") as f:
+                        data = f.read()
+                except OSError:
+                    continue
+                trigrams = array("I") if b"\0" in data else _trigrams(data)
+            self._add(rel_path, stat.st_mtime_ns, stat.st_size, trigrams)
+            indexed += 1
+            records.append(
+                _encode_record(
+                    rel_path, stat.st_mtime_ns, stat.st_size, trigrams
+                )
+            )
+
+        for rel_path in [path for path in self._files if path not in seen]:
+            self._remove_id(self._files.pop(rel_path)[0])
+            records.append(_encode_record(rel_path, 0, -1, None))
+
+        if records:
+            self._save(records)
+        return indexed
+
+    def candidates(
+        self, rel_paths: Iterable[str], required: set[int]
+    ) -> Iterator[str]:
+        """Filter paths down to files that may contain all trigrams."""
+        if not required:
+            yield from rel_paths
+            return
+        postings = [self._postings.get(trigram) for trigram in required]
+        ids: set[int] = set()
+        if all(posting is not None for posting in postings):
+            postings.sort(key=len)
+            ids = set(postings[0])
+            for posting in postings[1:]:
+                if not ids:
+                    break
+                ids.intersection_update(posting)
+        for rel_path in rel_paths:
+            entry = self._files.get(rel_path)
+            if (
+                entry is None
+                or entry[0] in ids
+                or entry[0] in self._unindexed
+            ):
+                yield rel_path
+
+
+def _encode_record(
+    rel_path: str, mtime_ns: int, size: int, trigrams: array | None
+) -> bytes:
+    """Encode a journal record; a negative size marks a removed file."""
+    encoded = rel_path.encode()
+    count = _UNINDEXED if trigrams is None else len(trigrams)
+    header = _RECORD.pack(mtime_ns, size, count, len(encoded))
+    body = b"" if trigrams is None else trigrams.tobytes()
+    return header + encoded + body
+
+
+def _read_records(
+    data: bytes,
+) -> Iterator[tuple[str, int, int, array | None]]:
+    """Decode journal records, stopping at a truncated one."""
+    view = memoryview(data)
+    offset = 0
+    while offset + _RECORD.size <= len(view):
+        mtime_ns, size, count, path_length = _RECORD.unpack_from(view, offset)
+        offset += _RECORD.size
+        trigram_bytes = 0 if count == _UNINDEXED else 4 * count
+        if offset + path_length + trigram_bytes > len(view):
+            return
+        rel_path = bytes(view[offset : offset + path_length]).decode()
+        offset += path_length
+        trigrams = None
+        if count != _UNINDEXED:
+            trigrams = array("I")
+            trigrams.frombytes(view[offset : offset + trigram_bytes])
+            offset += trigram_bytes
+        yield rel_path, mtime_ns, size, trigrams
+
+
+def get_index(
+    root: str, index_dir: str | Path | None = DEFAULT_INDEX_DIR
+) -> TrigramIndex:
+    """Get the shared index of a directory, loading it on first use."""
+    key = (os.path.realpath(root), str(index_dir) if index_dir else None)
+    with _indexes_lock:
+        if key not in _indexes:
+            _indexes[key] = TrigramIndex(root, index_dir)
+        return _indexes[key]
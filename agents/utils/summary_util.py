@@ -0,0 +1,88 @@
+"""Background summarization of old message history."""
+
+import json
+from typing import Any
+
+from .client_util import call_api
+
+SUMMARY_SYSTEM_PROMPT = (
+    "You compress the early part of a conversation between a user and an "
+    "AI agent that uses tools. Write a concise summary that preserves the "
+    "user's goals, decisions made, facts and results discovered by tools, "
+    "file names and identifiers, and any open questions. Do not add "
+    "commentary."
+)
+MAX_RESULT_CHARS = 2000
+
+
+def _render_block(block: Any) -> str:
+    """Render a content block as plain text for the summarizer."""
+    if not isinstance(block, dict):
+        block = block.model_dump() if hasattr(block, "model_dump") else {}
+    block_type = block.get("type")
+
+    if block_type == "text":
+        return block.get("text", "")
+    if block_type == "tool_use":
+        arguments = json.dumps(block.get("input", {}), default=str)
+        return f"[Called tool {block.get('name')} with {arguments}]"
+    if block_type == "tool_result":
+        content = block.get("content", "")
+        if not isinstance(content, str):
+            content = "\n".join(_render_block(item) for item in content)
+        if len(content) > MAX_RESULT_CHARS:
+            content = content[:MAX_RESULT_CHARS] + "..."
+        return f"[Tool result: {content}]"
+    return f"[{block_type} content]"
+
+
+def render_transcript(messages: list[dict[str, Any]]) -> str:
+    """Render messages as a plain text transcript."""
+    return "\n\n".join(
+        f"{message['role'].upper()}: "
+        + "\n".join(_render_block(block) for block in message["content"])
+        for message in messages
+    )
+
+
+class SummaryCompactor:
+    """Summarizes the oldest span of a history with a cheaper model.
+
+    Once a history's total tokens cross `watermark` of its context window,
+    the history starts a background task that calls `summarize` and swaps
+    the summary in when it completes.
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        model: str = "claude-3-5-haiku-20241022",
+        watermark: float = 0.7,
+        max_tokens: int = 1024,
+    ):
+        self.client = client
+        self.model = model
+        self.watermark = watermark
+        self.max_tokens = max_tokens
+
+    def should_compact(self, total_tokens: int, context_window: int) -> bool:
+        """Check whether history has crossed the compaction watermark."""
+        return total_tokens >= self.watermark * context_window
+
+    async def summarize(self, messages: list[dict[str, Any]]) -> str:
+        """Summarize a span of messages."""
+        response = await call_api(
+            self.client.messages.create,
+            model=self.model,
+            max_tokens=self.max_tokens,
+            system=SUMMARY_SYSTEM_PROMPT,
+            messages=[
+                {
+                    "role": "user",
+                    "content": render_transcript(messages),
+                }
+            ],
+        )
+        return "".join(
+            block.text for block in response.content if block.type == "text"
+        )
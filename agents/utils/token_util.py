@@ -0,0 +1,219 @@
+"""Offline token estimation for message history accounting."""
+
+import base64
+import hashlib
+import json
+import os
+import re
+import struct
+from pathlib import Path
+from typing import Any
+
+DEFAULT_CACHE_PATH = Path.home() / ".cache" / "agents" / "token_counts.json"
+
+# Images are downscaled so the long edge fits in this many pixels
+MAX_IMAGE_EDGE = 1568
+MAX_IMAGE_TOKENS = 1600
+PIXELS_PER_TOKEN = 750
+PDF_PAGE_TOKENS = 2000
+BLOCK_OVERHEAD_TOKENS = 3
+
+
+def _image_size(data: bytes) -> tuple[int, int] | None:
+    """Read width and height from the header of a PNG, GIF, JPEG or WebP."""
+    if data.startswith(b"\x89PNG\r\n\x1a\n") and len(data) >= 24:
+        return struct.unpack(">II", data[16:24])
+    if data[:6] in (b"GIF87a", b"GIF89a") and len(data) >= 10:
+        return struct.unpack("<HH", data[6:10])
+    if data.startswith(b"RIFF") and data[8:12] == b"WEBP":
+        chunk = data[12:16]
+        if chunk == b"VP8X" and len(data) >= 30:
+            width = int.from_bytes(data[24:27], "little") + 1
+            height = int.from_bytes(data[27:30], "little") + 1
+            return width, height
+        if chunk == b"VP8 " and len(data) >= 30:
+            width, height = struct.unpack("<HH", data[26:30])
+            return width & 0x3FFF, height & 0x3FFF
+        if chunk == b"VP8L" and len(data) >= 25:
+            bits = int.from_bytes(data[21:25], "little")
+            return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+        return None
+    if data.startswith(b"\xff\xd8"):
+        i = 2
+        while i + 9 < len(data):
+            if data[i] != 0xFF:
+                i += 1
+                continue
+            marker = data[i + 1]
+            # Start-of-frame markers carry the dimensions
+            if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+                height, width = struct.unpack(">HH", data[i + 5 : i + 9])
+                return width, height
+            (length,) = struct.unpack(">H", data[i + 2 : i + 4])
+            i += 2 + length
+    return None
+
+
+def _decode_prefix(data: str, size: int) -> bytes:
+    """Decode the first `size` bytes of base64 data."""
+    chunk = data[: (size // 3) * 4]
+    try:
+        return base64.b64decode(chunk)
+    except ValueError:
+        return b""
+
+
+def _as_dict(block: Any) -> dict[str, Any]:
+    """Convert an SDK content block into a plain dict."""
+    if isinstance(block, dict):
+        return block
+    if hasattr(block, "model_dump"):
+        return block.model_dump()
+    return vars(block)
+
+
+class TokenEstimator:
+    """Estimates token counts offline, calibrated against observed usage.
+
+    Text is estimated from its length, images from their pixel dimensions
+    and PDFs from their page count. The characters-per-token ratio is
+    adjusted as real usage is observed, and measured system prompt sizes
+    are persisted to `cache_path` keyed by a hash of model, prompt and
+    tool definitions.
+    """
+
+    def __init__(
+        self,
+        chars_per_token: float = 4.0,
+        cache_path: str | Path | None = DEFAULT_CACHE_PATH,
+    ):
+        self.chars_per_token = chars_per_token
+        self.cache_path = Path(cache_path) if cache_path else None
+        self._system_cache: dict[str, int] | None = None
+
+    def estimate_text(self, text: str) -> int:
+        """Estimate the tokens in a piece of text."""
+        return int(len(text) / self.chars_per_token) + 1
+
+    def estimate_image(self, source: dict[str, Any]) -> int:
+        """Estimate the tokens of an image from its dimensions."""
+        if source.get("type") != "base64":
+            return MAX_IMAGE_TOKENS
+        size = _image_size(_decode_prefix(source.get("data", ""), 65536))
+        if not size or not all(size):
+            return MAX_IMAGE_TOKENS
+
+        width, height = size
+        scale = min(1.0, MAX_IMAGE_EDGE / max(width, height))
+        tokens = int(width * scale * height * scale / PIXELS_PER_TOKEN)
+        return min(max(tokens, 1), MAX_IMAGE_TOKENS)
+
+    def estimate_document(self, source: dict[str, Any]) -> int:
+        """Estimate the tokens of a document block."""
+        if source.get("type") == "text":
+            return self.estimate_text(source.get("data", ""))
+        if source.get("type") == "content":
+            return self.estimate_content(source.get("content", []))
+        if source.get("type") == "base64":
+            try:
+                data = base64.b64decode(source.get("data", ""))
+            except ValueError:
+                data = b""
+            pages = len(re.findall(rb"/Type\s*/Page\b", data))
+            return max(pages, 1) * PDF_PAGE_TOKENS
+        return PDF_PAGE_TOKENS
+
+    def estimate_block(self, block: Any) -> int:
+        """Estimate the tokens of a single content block."""
+        block = _as_dict(block)
+        block_type = block.get("type")
+
+        if block_type == "text":
+            tokens = self.estimate_text(block.get("text", ""))
+        elif block_type == "image":
+            tokens = self.estimate_image(block.get("source", {}))
+        elif block_type == "document":
+            tokens = self.estimate_document(block.get("source", {}))
+        elif block_type == "tool_use":
+            tokens = self.estimate_text(
+                block.get("name", "") + json.dumps(block.get("input", {}))
+            )
+        elif block_type == "tool_result":
+            tokens = self.estimate_content(block.get("content", ""))
+        else:
+            tokens = self.estimate_text(json.dumps(block, default=str))
+        return tokens + BLOCK_OVERHEAD_TOKENS
+
+    def estimate_content(self, content: str | list[Any]) -> int:
+        """Estimate the tokens of message content."""
+        if isinstance(content, str):
+            return self.estimate_text(content)
+        return sum(self.estimate_block(block) for block in content)
+
+    def observe(self, estimated: int, actual: int) -> None:
+        """Calibrate the text ratio against an observed token count."""
+        if estimated <= 0 or actual <= 0:
+            return
+        observed = self.chars_per_token * estimated / actual
+        ratio = 0.8 * self.chars_per_token + 0.2 * observed
+        self.chars_per_token = min(max(ratio, 1.5), 8.0)
+
+    def _system_key(
+        self, model: str, system: str, tools: list[dict[str, Any]] | None
+    ) -> str:
+        payload = json.dumps(tools or [], sort_keys=True, default=str)
+        return hashlib.sha256(
+            f"{model}\0{system}\0{payload}".encode()
+        ).hexdigest()
+
+    def _load_system_cache(self) -> dict[str, int]:
+        if self._system_cache is None:
+            self._system_cache = {}
+            if self.cache_path and self.cache_path.exists():
+                try:
+                    self._system_cache = json.loads(
+                        self.cache_path.read_text()
+                    )
+                except (OSError, ValueError):
+                    pass
+        return self._system_cache
+
+    def estimate_system(
+        self,
+        model: str,
+        system: str,
+        tools: list[dict[str, Any]] | None = None,
+    ) -> int:
+        """Get the size of a system prompt and tools, measured if possible."""
+        key = self._system_key(model, system, tools)
+        cached = self._load_system_cache().get(key)
+        if cached is not None:
+            return cached
+        tokens = self.estimate_text(system)
+        if tools:
+            tokens += self.estimate_text(json.dumps(tools, default=str))
+        return tokens
+
+    def record_system(
+        self,
+        model: str,
+        system: str,
+        tokens: int,
+        tools: list[dict[str, Any]] | None = None,
+    ) -> None:
+        """Remember the measured size of a system prompt and tools."""
+        cache = self._load_system_cache()
+        key = self._system_key(model, system, tools)
+        if cache.get(key) == tokens:
+            return
+        cache[key] = tokens
+
+        if not self.cache_path:
+            return
+        try:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.cache_path.with_suffix(f".{os.getpid()}.tmp")
+            tmp_path.write_text(json.dumps(cache))
+            os.replace(tmp_path, self.cache_path)
+        except OSError:
+            pass
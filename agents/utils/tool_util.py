@@ -1,22 +1,191 @@
 """Tool execution utility with parallel execution support."""
 
 import asyncio
-from typing import Any
+import time
+from collections import OrderedDict
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import Any, AsyncIterator
+
+
+def is_error_result(result: Any) -> bool:
+    """Check whether a tool returned an error message instead of a result.
+
+    Tools report failures as strings starting with "Error", e.g.
+    "Error: ..." or "Error executing ...".
+    """
+    return isinstance(result, str) and result.startswith("Error")
+
+
+class ToolResultCache:
+    """LRU cache of results for tools that declare themselves cacheable.
+
+    Entries expire after the tool's `cache_ttl` and are ignored when the
+    tool's `cache_validator` returns a different value than at execution
+    time. The least recently used entry is evicted beyond `maxsize`.
+    Error results are never cached, since the failure may be transient,
+    and neither are calls whose `cache_key` is None.
+    """
+
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: OrderedDict[Any, tuple[Any, Any, float | None]] = (
+            OrderedDict()
+        )
+
+    async def call(self, tool: Any, arguments: dict[str, Any]) -> Any:
+        """Return a cached result for the call, or execute and cache it."""
+        call_key = tool.cache_key(**arguments)
+        if call_key is None:
+            return await tool.execute(**arguments)
+        key = (tool.name, call_key)
+        validator = tool.cache_validator(**arguments)
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            result, cached_validator, expires_at = entry
+            if cached_validator == validator and (
+                expires_at is None or time.monotonic() < expires_at
+            ):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return result
+            del self._entries[key]
+
+        self.misses += 1
+        result = await tool.execute(**arguments)
+        if is_error_result(result):
+            return result
+
+        expires_at = None
+        if tool.cache_ttl is not None:
+            expires_at = time.monotonic() + tool.cache_ttl
+        self._entries[key] = (result, validator, expires_at)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        return result
+
+    def stats(self) -> dict[str, int]:
+        """Get hit, miss and eviction counters."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self._entries),
+        }
+
+    def clear(self) -> None:
+        """Drop all cached results."""
+        self._entries.clear()
+
+
+class ToolLimits:
+    """Concurrency limits and deadlines for tool execution.
+
+    `max_concurrency` bounds all tool calls sharing this object, while a
+    tool's own `max_concurrency` bounds calls to that tool. Each call must
+    finish within its tool's `timeout`, or `default_timeout` if unset.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int | None = None,
+        default_timeout: float | None = None,
+    ):
+        self.max_concurrency = max_concurrency
+        self.default_timeout = default_timeout
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._global: asyncio.Semaphore | None = None
+        self._per_tool: dict[str, asyncio.Semaphore] = {}
+
+    def _semaphores(self, tool: Any) -> list[asyncio.Semaphore]:
+        """Get the semaphores a call to `tool` must hold."""
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # Semaphores are bound to the loop they are first used on
+            self._loop = loop
+            self._per_tool.clear()
+            self._global = None
+            if self.max_concurrency:
+                self._global = asyncio.Semaphore(self.max_concurrency)
+
+        semaphores = []
+        if tool.max_concurrency:
+            if tool.name not in self._per_tool:
+                self._per_tool[tool.name] = asyncio.Semaphore(
+                    tool.max_concurrency
+                )
+            semaphores.append(self._per_tool[tool.name])
+        if self._global is not None:
+            semaphores.append(self._global)
+        return semaphores
+
+    @asynccontextmanager
+    async def acquire(self, tool: Any) -> AsyncIterator[None]:
+        """Hold a slot for one call to `tool`."""
+        async with AsyncExitStack() as stack:
+            # Take the tool's slot before a global one so waiting for a
+            # busy tool does not block calls to other tools
+            for semaphore in self._semaphores(tool):
+                await stack.enter_async_context(semaphore)
+            yield
+
+    def timeout_for(self, tool: Any) -> float | None:
+        """Get the deadline in seconds for a call to `tool`."""
+        if tool.timeout is not None:
+            return tool.timeout
+        return self.default_timeout
 
 
 async def _execute_single_tool(
-    call: Any, tool_dict: dict[str, Any]
+    call: Any,
+    tool_dict: dict[str, Any],
+    cache: ToolResultCache | None = None,
+    limits: ToolLimits | None = None,
 ) -> dict[str, Any]:
     """Execute a single tool and handle errors."""
     response = {"type": "tool_result", "tool_use_id": call.id}
 
-    try:
-        # Execute the tool directly
-        result = await tool_dict[call.name].execute(**call.input)
-        response["content"] = str(result)
-    except KeyError:
+    tool = tool_dict.get(call.name)
+    if tool is None:
         response["content"] = f"Tool '{call.name}' not found"
         response["is_error"] = True
+        return response
+
+    async def run() -> Any:
+        if cache is not None and tool.cacheable:
+            return await cache.call(tool, call.input)
+        # Execute the tool directly
+        return await tool.execute(**call.input)
+
+    async def run_limited() -> Any:
+        if limits is None:
+            return await run()
+        async with limits.acquire(tool):
+            return await run()
+
+    timeout = limits.timeout_for(tool) if limits else tool.timeout
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    try:
+        result = await asyncio.wait_for(run_limited(), timeout)
+        # Lists are content blocks, e.g. text and images from MCP tools
+        if isinstance(result, list):
+            response["content"] = result
+        else:
+            response["content"] = str(result)
+    except asyncio.TimeoutError as e:
+        # The tool may raise TimeoutError itself before any deadline
+        if timeout is None or loop.time() - started < timeout:
+            response["content"] = f"Error executing tool: {e!r}"
+        else:
+            response["content"] = (
+                f"Tool '{call.name}' timed out after {timeout}s"
+            )
+        response["is_error"] = True
     except Exception as e:
         response["content"] = f"Error executing tool: {str(e)}"
         response["is_error"] = True
@@ -25,15 +194,34 @@ async def _execute_single_tool(
 
 
 async def execute_tools(
-    tool_calls: list[Any], tool_dict: dict[str, Any], parallel: bool = True
+    tool_calls: list[Any],
+    tool_dict: dict[str, Any],
+    parallel: bool = True,
+    cache: ToolResultCache | None = None,
+    limits: ToolLimits | None = None,
 ) -> list[dict[str, Any]]:
-    """Execute multiple tools sequentially or in parallel."""
+    """Execute multiple tools sequentially or in parallel.
+
+    If the caller is cancelled, in-flight parallel calls are cancelled and
+    awaited before the cancellation propagates.
+    """
 
     if parallel:
-        return await asyncio.gather(
-            *[_execute_single_tool(call, tool_dict) for call in tool_calls]
-        )
+        tasks = [
+            asyncio.ensure_future(
+                _execute_single_tool(call, tool_dict, cache, limits)
+            )
+            for call in tool_calls
+        ]
+        try:
+            return await asyncio.gather(*tasks)
+        except asyncio.CancelledError:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
     else:
         return [
-            await _execute_single_tool(call, tool_dict) for call in tool_calls
+            await _execute_single_tool(call, tool_dict, cache, limits)
+            for call in tool_calls
         ]